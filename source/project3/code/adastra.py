@@ -1,6 +1,7 @@
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.integrate import solve_ivp
+from batch_ode import damped_pendulum as damped_pendulum_batch, grid_states, solve_batch
 
 # Physical constants
 g = 9.81       # gravity (m/s^2)
@@ -48,4 +49,15 @@ axs[2].set_ylabel("Angular Acceleration (rad/s²)")
 axs[2].grid(True)
 
 plt.tight_layout(rect=[0, 0.03, 1, 0.95])
+
+# Phase portrait: a grid of initial conditions integrated in one batched call
+y0_grid = grid_states(theta=np.linspace(-2*np.pi, 2*np.pi, 9), omega=np.linspace(-8, 8, 9))
+trajectories = solve_batch(damped_pendulum_batch, y0_grid, t_eval, args=(b, m, g, L))
+
+plt.figure(figsize=(8, 6))
+plt.plot(trajectories[:, :, 0], trajectories[:, :, 1], linewidth=0.5)
+plt.xlabel("Angle (rad)")
+plt.ylabel("Angular Velocity (rad/s)")
+plt.title("Phase Portrait of the Damped Pendulum")
+plt.grid(True)
 plt.show()
@@ -0,0 +1,203 @@
+"""
+Reaction Wheel Inverted Pendulum - region of attraction
+
+Runs the full hybrid controller (Bang-bang, brake, LQR/PID) from a grid of
+initial states (qp, qp_d, qr_d) with the compiled kernel (or the NumPy
+ensemble without numba), split into chunks over a process pool, and records
+per cell whether the pendulum settles upright, the time to settle and the
+energy used.
+
+Cells whose corners disagree on settling are refined adaptively: each
+refinement level halves the grid spacing inside boundary cells only, so the
+basin boundary gets the resolution of a much finer grid at a fraction of
+the cost.
+
+Usage:
+    import numpy as np
+    import param
+    from basin import map_basin
+
+    basin = map_basin(param, qp=np.linspace(-180, 180, 101), qp_d=np.linspace(-10, 10, 101),
+                      qr_d=np.linspace(-100, 100, 101), t_end=10.0, refine=2, workers=8)
+    basin.grid("settled"), basin.grid("settle_time"), basin.grid("energy")   # coarse grid
+    basin.points, basin.level, basin.settled, ...                            # all samples
+    basin.save("basin.npz")
+
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import numpy as np
+
+from ensemble import EnsembleState, ensemble_gains, ensemble_step
+from kernel import HAVE_NUMBA, simulate_compiled
+from rwip import make_params
+
+AXES = ("qp", "qp_d", "qr_d")  # deg, rad/s, rad/s
+RESULTS = ("settled", "settle_time", "energy")
+
+
+def run_cells(params, points, t_end=10.0, dt=1e-3, K=None, tol_deg=0.1):
+    """Settled flag, time to settle and energy for (N, 3) initial states.
+
+    A cell is settled when |qp - setpoint| < tol_deg at t_end; its settle time
+    is when it last entered that band (0 if it never left it, nan if not
+    settled). Energy integrates |qr_d * Tm| over the whole run, swing-up
+    included, unlike the FUEL readout which only counts the stabilize phase.
+    """
+    qp, qp_d, qr_d = np.asarray(points, dtype=float).T
+    state = EnsembleState(np.deg2rad(qp), qp_d, params.init_qr, qr_d)
+    n = len(state)
+    stabilizer = params.Stabilize_Controller
+    if K is None and stabilizer == "LQR":
+        K = ensemble_gains(params, n)
+    if K is not None:
+        K = np.broadcast_to(K, (n, 4))
+
+    steps = int(round(t_end / dt))
+    if HAVE_NUMBA:
+        metrics = np.zeros((n, 2))
+        metrics[:, 1] = -1.0  # never outside the band
+        simulate_compiled(params, steps * dt, dt, state, params.init_Tp, K, stabilizer, metrics, tol_deg)
+        energy, last_outside = metrics.T
+    else:
+        tol = np.deg2rad(tol_deg)
+        last_outside = np.full(n, -1.0)
+        energy = np.zeros(n)
+        for k in range(steps):
+            ensemble_step(state, params, dt, params.init_Tp, K, stabilizer)
+            energy += np.abs(state.qr_d * state.Tm) * dt
+            last_outside[np.abs(state.qp - state.setpoint) >= tol] = (k + 1) * dt
+
+    settled = last_outside < steps * dt - dt / 2 if steps else np.zeros(n, dtype=bool)
+    settle_time = np.where(settled, np.where(last_outside < 0, 0.0, last_outside + dt), np.nan)
+    return settled, settle_time, energy
+
+
+def _run_chunk(args):
+    return run_cells(*args)
+
+
+def evaluate(params, points, t_end=10.0, dt=1e-3, tol_deg=0.1, workers=None, chunk_size=20000):
+    """run_cells over many points, in chunks spread over a process pool.
+
+    The compiled kernel already runs in parallel over all cores, so with
+    numba the chunks run in this process unless workers is given.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    K = None
+    if params.Stabilize_Controller == "LQR":
+        K = ensemble_gains(params, 1)[:1]  # one gain for the whole map
+    chunks = [(params, points[i:i + chunk_size], t_end, dt, K, tol_deg) for i in range(0, len(points), chunk_size)]
+    workers = workers or (1 if HAVE_NUMBA else os.cpu_count() or 1)
+    if workers == 1 or len(chunks) <= 1:
+        parts = [_run_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_run_chunk, chunks))
+    if not parts:
+        return np.zeros(0, dtype=bool), np.zeros(0), np.zeros(0)
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+class BasinMap:
+    """Samples of the basin map: coarse grid plus adaptively refined points.
+
+    Samples are indexed on an integer lattice 2**refine times finer than the
+    coarse grid; level is the refinement level a sample was added at.
+    """
+
+    def __init__(self, axes, refine, lattice, level, settled, settle_time, energy):
+        self.axes = tuple(np.asarray(a, dtype=float) for a in axes)
+        self.refine = refine
+        self.lattice = lattice
+        self.level = level
+        self.settled = settled
+        self.settle_time = settle_time
+        self.energy = energy
+
+    def __len__(self):
+        return len(self.lattice)
+
+    @property
+    def points(self):
+        """Initial states (N, 3) of all samples in param units (deg, rad/s, rad/s)."""
+        scale = 2 ** self.refine
+        return np.column_stack([np.interp(self.lattice[:, d] / scale, np.arange(len(a)), a)
+                                for d, a in enumerate(self.axes)])
+
+    def grid(self, name):
+        """Result on the coarse grid, shape (len(qp), len(qp_d), len(qr_d))."""
+        scale = 2 ** self.refine
+        coarse = np.all(self.lattice % scale == 0, axis=1)
+        shape = tuple(len(a) for a in self.axes)
+        out = np.empty(shape, dtype=getattr(self, name).dtype)
+        out[tuple((self.lattice[coarse] // scale).T)] = getattr(self, name)[coarse]
+        return out
+
+    def save(self, path):
+        np.savez(path, refine=self.refine, lattice=self.lattice, level=self.level, settled=self.settled,
+                 settle_time=self.settle_time, energy=self.energy, **dict(zip(AXES, self.axes)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls([data[name] for name in AXES], int(data["refine"]), data["lattice"], data["level"],
+                       data["settled"], data["settle_time"], data["energy"])
+
+
+def _boundary_cells(lattice, settled, size, bounds):
+    """Origins of cells of the given size whose evaluated corners disagree."""
+    codes = np.ravel_multi_index(lattice.T, bounds)
+    order = np.argsort(codes)
+    codes, labels = codes[order], settled[order]
+
+    origins = lattice[np.all(lattice % size == 0, axis=1) & np.all(lattice + size < bounds, axis=1)]
+    corners = np.stack([origins + size * np.array(offset) for offset in product((0, 1), repeat=3)], axis=1)
+    corner_codes = np.ravel_multi_index(corners.reshape(-1, 3).T, bounds).reshape(len(origins), 8)
+    pos = np.minimum(np.searchsorted(codes, corner_codes), len(codes) - 1)
+    found = codes[pos] == corner_codes
+    corner_labels = labels[pos]
+    complete = found.all(axis=1)
+    mixed = corner_labels.any(axis=1) & ~corner_labels.all(axis=1)
+    return origins[complete & mixed]
+
+
+def map_basin(params, qp, qp_d, qr_d, t_end=10.0, dt=1e-3, refine=0, tol_deg=0.1, workers=None,
+              chunk_size=20000):
+    """Basin of attraction of the hybrid controller over a grid of initial states.
+
+    qp is in degrees, qp_d and qr_d in rad/s (as init_qp, init_qp_d and
+    init_qr_d in param). refine is the number of boundary refinement levels.
+    """
+    params = make_params(params)
+    axes = tuple(np.asarray(a, dtype=float) for a in (qp, qp_d, qr_d))
+    scale = 2 ** refine
+    bounds = tuple((len(a) - 1) * scale + 1 for a in axes)
+
+    def run(lattice):
+        points = np.column_stack([np.interp(lattice[:, d] / scale, np.arange(len(a)), a)
+                                  for d, a in enumerate(axes)])
+        return evaluate(params, points, t_end, dt, tol_deg, workers, chunk_size)
+
+    lattice = np.stack(np.meshgrid(*(np.arange(len(a)) * scale for a in axes), indexing="ij"), axis=-1).reshape(-1, 3)
+    columns = list(run(lattice))
+    level = np.zeros(len(lattice), dtype=np.int8)
+
+    for lvl in range(1, refine + 1):
+        step = scale >> lvl
+        origins = _boundary_cells(lattice, columns[0], 2 * step, bounds)
+        if not len(origins):
+            break
+        offsets = np.array(list(product((0, 1, 2), repeat=3))) * step
+        candidates = np.unique((origins[:, None, :] + offsets).reshape(-1, 3), axis=0)
+        known = np.ravel_multi_index(lattice.T, bounds)
+        new = candidates[~np.isin(np.ravel_multi_index(candidates.T, bounds), known)]
+        results = run(new)
+        lattice = np.concatenate([lattice, new])
+        level = np.concatenate([level, np.full(len(new), lvl, dtype=np.int8)])
+        columns = [np.concatenate([c, r]) for c, r in zip(columns, results)]
+
+    return BasinMap(axes, refine, lattice, level, *columns)
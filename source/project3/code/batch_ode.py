@@ -0,0 +1,162 @@
+"""
+Batched ODE integration - many initial conditions of one vectorized flow
+
+Integrates N initial conditions of one flow at once. The right-hand side
+takes the whole batch, fun(t, y, *args) with y (N, n) -> (N, n), so one
+NumPy evaluation replaces N interpreted calls; per-trajectory parameters
+are (N,) arrays in args.
+
+    solve_batch   adaptive Dormand-Prince 5(4) (the RK45 of solve_ivp) with
+                  one step size for the batch; the error norm is the worst
+                  trajectory's, so every trajectory meets rtol/atol, and
+                  steps end exactly on the t_eval times (no dense output)
+    rk4_batch     classic fixed-step RK4, `substeps` steps between outputs
+
+Vectorized flows: damped_pendulum (adastra.py) here, kapitza.flow_batch
+(codeNolte.py).
+
+Usage:
+    import numpy as np
+    from batch_ode import damped_pendulum, grid_states, solve_batch
+
+    y0 = grid_states(theta=np.linspace(-np.pi, np.pi, 30), omega=np.linspace(-8, 8, 30))
+    y = solve_batch(damped_pendulum, y0, np.linspace(0, 10, 1000), args=(0.5, 1.0, 9.81, 1.0))
+    y.shape   # (1000, 900, 2): time, trajectory, state
+
+    python batch_ode.py     # stability map of the inverted Kapitza pendulum over (F, w)
+
+"""
+
+import numpy as np
+
+# Dormand-Prince 5(4) tableau
+_C = np.array([0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1])
+_A = (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+)
+_B = (35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84)
+_E = (71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40)  # 5th minus 4th order weights
+
+
+def grid_states(**axes):
+    """(N, len(axes)) initial conditions for all combinations of the axis values, first axis slowest."""
+    mesh = np.meshgrid(*(np.asarray(v, dtype=float) for v in axes.values()), indexing="ij")
+    return np.column_stack([m.ravel() for m in mesh])
+
+
+def _combine(y, h, weights, k):
+    out = y.copy()
+    for w, ki in zip(weights, k):
+        if w:
+            out += (h * w) * ki
+    return out
+
+
+def solve_batch(fun, y0, t_eval, args=(), rtol=1e-6, atol=1e-9, first_step=None, max_steps=1000000):
+    """States (len(t_eval), N, n) of the batch y0 (N, n) at the times t_eval (t_eval[0] is the start)."""
+    t_eval = np.asarray(t_eval, dtype=float)
+    y = np.array(y0, dtype=float, ndmin=2)
+    out = np.empty((len(t_eval),) + y.shape)
+    out[0] = y
+    t = t_eval[0]
+    f = fun(t, y, *args)
+
+    if first_step is None:
+        scale = atol + rtol * np.abs(y)
+        d0 = np.sqrt(np.mean((y / scale) ** 2))
+        d1 = np.sqrt(np.mean((f / scale) ** 2))
+        h = 0.01 * d0 / d1 if d0 > 1e-5 and d1 > 1e-5 else 1e-6
+    else:
+        h = first_step
+
+    steps = 0
+    for i in range(1, len(t_eval)):
+        t_next = t_eval[i]
+        while t < t_next:
+            if steps == max_steps:
+                raise RuntimeError(f"solve_batch took more than {max_steps} steps, stopped at t = {t:.6g}")
+            steps += 1
+            clipped = h >= t_next - t
+            h_try = t_next - t if clipped else h
+
+            k = [f]
+            for c, a in zip(_C[1:], _A[1:]):
+                k.append(fun(t + c * h_try, _combine(y, h_try, a, k), *args))
+            y_new = _combine(y, h_try, _B, k)
+            f_new = fun(t + h_try, y_new, *args)
+            k.append(f_new)
+            err = _combine(np.zeros_like(y), h_try, _E, k)
+
+            scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+            err_norm = np.sqrt(np.mean((err / scale) ** 2, axis=1)).max()  # worst trajectory
+            if not np.isfinite(err_norm):
+                h = 0.2 * h_try
+                continue
+            factor = min(10.0, max(0.2, 0.9 * err_norm ** -0.2)) if err_norm > 0 else 10.0
+            if err_norm <= 1.0:
+                t = t_next if clipped else t + h_try
+                y, f = y_new, f_new
+                h = max(h, h_try * factor) if clipped else h_try * factor
+            else:
+                h = h_try * min(factor, 1.0)
+            if h < 1e-14 * max(1.0, abs(t)):
+                raise RuntimeError(f"solve_batch step size underflow at t = {t:.6g}")
+        out[i] = y
+    return out
+
+
+def rk4_batch(fun, y0, t_eval, args=(), substeps=1):
+    """States (len(t_eval), N, n) with `substeps` RK4 steps between consecutive times of t_eval."""
+    t_eval = np.asarray(t_eval, dtype=float)
+    y = np.array(y0, dtype=float, ndmin=2)
+    out = np.empty((len(t_eval),) + y.shape)
+    out[0] = y
+    for i in range(1, len(t_eval)):
+        t = t_eval[i - 1]
+        h = (t_eval[i] - t) / substeps
+        for _ in range(substeps):
+            k1 = fun(t, y, *args)
+            k2 = fun(t + h / 2, y + (h / 2) * k1, *args)
+            k3 = fun(t + h / 2, y + (h / 2) * k2, *args)
+            k4 = fun(t + h, y + h * k3, *args)
+            y = y + (h / 6) * (k1 + 2 * k2 + 2 * k3 + k4)
+            t += h
+        out[i] = y
+    return out
+
+
+# ===== Flows =====
+def damped_pendulum(t, y, b, m, g, L):
+    """Damped pendulum of adastra.py for a batch y (N, 2) of (theta, omega)."""
+    dy = np.empty_like(y)
+    dy[:, 0] = y[:, 1]
+    dy[:, 1] = -(b / m) * y[:, 1] - (g / L) * np.sin(y[:, 0])
+    return dy
+
+
+if __name__ == "__main__":
+    import time
+
+    import matplotlib.pyplot as plt
+
+    from kapitza import flow_batch
+
+    # Does the Kapitza pendulum stay inverted? One batch over a grid of drive amplitude and frequency
+    F_values, w_values = np.linspace(0, 200, 80), np.linspace(5, 40, 80)
+    Fw = grid_states(F=F_values, w=w_values)
+    y0 = np.column_stack([np.full(len(Fw), np.pi + 0.3), np.zeros(len(Fw)), np.zeros(len(Fw))])
+    start = time.perf_counter()
+    y = solve_batch(flow_batch, y0, np.linspace(0, 50, 501), args=(Fw[:, 0], 0.1, Fw[:, 1]))
+    print(f"{len(Fw)} trajectories in {time.perf_counter() - start:.1f} s")
+
+    distance = np.abs(np.pi - np.mod(y[:, :, 0], 2 * np.pi)).max(axis=0)  # Largest distance from inverted
+    plt.pcolormesh(w_values, F_values, (distance < 1.0).reshape(len(F_values), len(w_values)), shading="auto")
+    plt.xlabel("w")
+    plt.ylabel("F")
+    plt.title("Stays within 1 rad of inverted")
+    plt.show()
@@ -0,0 +1,63 @@
+"""
+Reaction Wheel Inverted Pendulum - benchmark fixtures
+
+Shared setup of the headless benchmarks (pytest-benchmark). Every benchmark
+records, besides the timings, the physics steps per second and the peak
+memory of one extra traced call in its extra_info, so both end up in the
+saved runs and in --benchmark-compare.
+
+Usage (from source/project3/code):
+    pytest benchmarks                                         # run and print the table
+    pytest benchmarks --benchmark-autosave                    # store a run in .benchmarks/
+    pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:10%
+
+"""
+
+import os
+import sys
+import tracemalloc
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import param  # noqa: E402
+from rwip import make_params  # noqa: E402
+
+
+@pytest.fixture
+def params():
+    """param without any files: gains stay in memory, no session log or export."""
+    return make_params(param, GainCacheFile=None, RecordFile=None, ExportFile=None)
+
+
+def peak_memory(fn, *args, **kwargs):
+    """Peak Python heap use (bytes) of one call of fn, from tracemalloc."""
+    tracemalloc.start()
+    try:
+        fn(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.fixture
+def measure(benchmark):
+    """Benchmark fn and record steps/s and peak memory.
+
+    steps is the number of physics steps (pendulum steps for ensembles) one
+    call performs; rounds > 0 runs a fixed number of rounds for slow calls.
+    Returns the result of the last call.
+    """
+    def run(fn, *args, steps=1, rounds=0, **kwargs):
+        if rounds:
+            result = benchmark.pedantic(fn, args, kwargs, rounds=rounds, warmup_rounds=1)
+        else:
+            result = benchmark(fn, *args, **kwargs)
+        if benchmark.stats is not None:  # None with --benchmark-disable
+            benchmark.extra_info["steps"] = steps
+            benchmark.extra_info["steps_per_s"] = steps / benchmark.stats.stats.mean
+            benchmark.extra_info["peak_memory_bytes"] = peak_memory(fn, *args, **kwargs)
+        return result
+
+    return run
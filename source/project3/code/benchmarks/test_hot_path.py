@@ -0,0 +1,105 @@
+"""
+Reaction Wheel Inverted Pendulum - hot path benchmarks
+
+Headless benchmarks of the code the simulator and the batch tools spend
+their time in: one physics step per integrator, the energy, the hybrid
+controller, a 10 s swing-up (single trial and simulator session) and a
+1000-trial ensemble on the NumPy and the compiled path.
+
+Usage:
+    pytest benchmarks/test_hot_path.py
+    pytest benchmarks -k swing_up
+
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from ensemble import EnsembleState, ensemble_energy, ensemble_gains, simulate_ensemble
+from integrators import make_stepper
+from kernel import HAVE_NUMBA, simulate_compiled
+from rwip import HybridController, RwipState, make_params, pendulum_energy, simulate
+from session import Session
+
+DT = 1e-3  # Step of the single-trial and ensemble runs
+T_SWING_UP = 10.0
+N_TRIALS = 1000
+
+
+# ===== Single step =====
+@pytest.mark.parametrize("method", ["euler", "semi-implicit", "rk4", "exponential"])
+def test_physics_step(measure, params, method):
+    step = make_stepper(params, method)
+    state = RwipState.from_params(params)
+    state = measure(step, state, 12.0, 0.0, 1.0 / params.PhysicsRate)
+    assert math.isfinite(state.qp)
+
+
+# ===== Energy =====
+def test_energy(measure, params):
+    E = measure(pendulum_energy, params, math.pi - 0.3, 1.5)
+    assert math.isfinite(E)
+
+
+def test_energy_ensemble(measure, params):
+    qp = np.linspace(0, 2 * np.pi, N_TRIALS)
+    qp_d = np.linspace(-5, 5, N_TRIALS)
+    E = measure(ensemble_energy, params, qp, qp_d, steps=N_TRIALS)
+    assert E.shape == (N_TRIALS,)
+
+
+# ===== Controller =====
+@pytest.mark.parametrize("qp, qp_d", [(math.pi - 0.3, 1.5), (0.05, -0.2)], ids=["swing-up", "stabilize"])
+def test_controller(measure, params, qp, qp_d):
+    controller = HybridController(params)
+    controller(qp, qp_d, 0.0, 0.0)  # enter the mode
+    Vin = measure(controller, qp, qp_d, 0.0, 0.0)
+    assert math.isfinite(Vin)
+
+
+# ===== Swing-up =====
+def test_swing_up(measure, params):
+    n = int(round(T_SWING_UP / DT))
+    out = measure(simulate, params, t_end=T_SWING_UP, dt=DT, steps=n, rounds=3)
+    assert len(out["t"]) == n
+
+
+def test_swing_up_session(measure, params):
+    """10 s of the simulator's physics loop at PhysicsRate, as run headless."""
+    n = int(round(T_SWING_UP * params.PhysicsRate))
+
+    def run():
+        session = Session(params)
+        session.run(n)
+        session.close()
+        return session
+
+    session = measure(run, steps=n, rounds=3)
+    assert session.step_count == n
+
+
+# ===== Ensemble =====
+def ensemble_params(params):
+    return make_params(params, init_qp=np.linspace(150, 210, N_TRIALS))
+
+
+def test_ensemble_numpy(measure, params):
+    p = ensemble_params(params)
+    K = ensemble_gains(p, N_TRIALS)
+    n = int(round(T_SWING_UP / DT))
+    state = measure(lambda: simulate_ensemble(p, T_SWING_UP, DT, EnsembleState.from_params(p, N_TRIALS), K=K),
+                    steps=n * N_TRIALS, rounds=3)
+    assert len(state) == N_TRIALS
+
+
+@pytest.mark.skipif(not HAVE_NUMBA, reason="numba is not installed")
+def test_ensemble_compiled(measure, params):
+    p = ensemble_params(params)
+    K = ensemble_gains(p, N_TRIALS)
+    n = int(round(T_SWING_UP / DT))
+    simulate_compiled(p, DT, DT, K=K)  # compile outside the timing
+    state = measure(lambda: simulate_compiled(p, T_SWING_UP, DT, EnsembleState.from_params(p, N_TRIALS), K=K),
+                    steps=n * N_TRIALS, rounds=5)
+    assert len(state) == N_TRIALS
@@ -0,0 +1,108 @@
+"""
+Bifurcation diagrams - return maps of the Kapitza pendulum over F and delt
+
+Sweeps the drive amplitude F and/or damping delt of the Kapitza pendulum
+(kapitza.py, the flow of codeNolte.py) and collects for every parameter
+point the stroboscopic return map after a transient: `points` states at
+t = (k + 1/2) T, k = transient .. transient + points - 1, each integrated by
+odeint at exactly those times (poincare.strobe).
+
+Points run in parallel worker processes and come back in order. Each
+finished point is kept in a ResultCache keyed on everything that changes
+it (F, delt, w, y0, transient, points, tolerances); with a cache file an
+extended or repeated sweep only integrates the new points.
+
+Usage:
+    import numpy as np
+    from bifurcation import bifurcation_sweep, plot_bifurcation
+    from cache import cache_path
+
+    out = bifurcation_sweep(F=np.linspace(30, 140, 400), delt=0.0, w=20, cache=cache_path("bifurcation.npz"))
+    plot_bifurcation(out, "F")
+
+    python bifurcation.py 30 140 400      # F from 30 to 140, 400 values
+
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from cache import ResultCache, cache_path, result_key
+from kapitza import DEFAULT_Y0, flow_deriv, period
+from poincare import strobe
+
+
+def return_map(F, delt, w, y0=DEFAULT_Y0, transient=200, points=200, rtol=1.49012e-8, atol=1.49012e-8):
+    """Return map (points, 2) of (x, v) after `transient` drive periods."""
+    _, y = strobe(flow_deriv, y0, period(w), points, skip=transient, args=(F, delt, w), rtol=rtol, atol=atol)
+    return y[:, :2]
+
+
+def _return_map(job):
+    return return_map(*job)
+
+
+def bifurcation_sweep(F, delt=0.0, w=20.0, y0=DEFAULT_Y0, transient=200, points=200, rtol=1.49012e-8,
+                      atol=1.49012e-8, workers=None, chunksize=None, cache=None):
+    """Return maps for all combinations of F and delt (scalars or 1-D arrays).
+
+    Returns a dict with "F" and "delt" (M,) per parameter point and "x",
+    "v" (M, points). cache is a ResultCache, a path for one, or None.
+    """
+    F_grid, delt_grid = (a.ravel() for a in np.meshgrid(np.atleast_1d(F), np.atleast_1d(delt), indexing="ij"))
+    if not isinstance(cache, ResultCache):
+        cache = ResultCache(cache)
+    y0 = tuple(float(v) for v in y0)
+    keys = [result_key(F=f, delt=d, w=w, y0=y0, transient=transient, points=points, rtol=rtol, atol=atol)
+            for f, d in zip(F_grid, delt_grid)]
+
+    missing = cache.missing(keys)
+    if missing:
+        index = {key: i for i, key in enumerate(keys)}
+        jobs = [(F_grid[index[key]], delt_grid[index[key]], w, y0, transient, points, rtol, atol) for key in missing]
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(jobs) <= 1:
+            maps = [_return_map(job) for job in jobs]
+        else:
+            chunksize = chunksize or max(1, len(jobs) // (4 * workers))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                maps = list(pool.map(_return_map, jobs, chunksize=chunksize))
+        for key, y in zip(missing, maps):
+            cache[key] = y
+        cache.save()
+
+    maps = np.array([cache[key] for key in keys]).reshape(len(keys), points, 2)
+    return {"F": F_grid, "delt": delt_grid, "x": maps[:, :, 0], "v": maps[:, :, 1]}
+
+
+def plot_bifurcation(out, axis="F", variable="x", ax=None):
+    """Scatter the return-map points of `variable` over the swept parameter `axis`.
+
+    Angles are wrapped to (-pi, pi], 0 hanging down and +-pi inverted.
+    """
+    import matplotlib.pyplot as plt
+
+    ax = ax or plt.figure().gca()
+    values = out[variable]
+    if variable == "x":
+        values = np.pi - np.mod(np.pi - values, 2 * np.pi)
+    ax.plot(np.repeat(out[axis], values.shape[1]), values.ravel(), "k,", alpha=0.5)
+    ax.set_xlabel(axis)
+    ax.set_ylabel(variable)
+    ax.set_title("Bifurcation diagram")
+    return ax
+
+
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
+    lo, hi, n = (float(sys.argv[1]), float(sys.argv[2]), int(sys.argv[3])) if len(sys.argv) > 3 else (30, 140, 200)
+    start = time.perf_counter()
+    out = bifurcation_sweep(F=np.linspace(lo, hi, n), cache=cache_path("bifurcation.npz"))
+    print(f"{n} values of F in {time.perf_counter() - start:.1f} s")
+    plot_bifurcation(out, "F")
+    plt.show()
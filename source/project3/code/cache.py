@@ -0,0 +1,112 @@
+"""
+Result cache - sweep results keyed on their inputs, kept in an .npz file
+
+Arrays keyed on a hash of the inputs that produced them, optionally kept in
+an .npz file between runs, so a sweep that is extended or rerun only
+computes the points it has not seen. gains.GainCache stores its LQR gains
+in one as well, by default in cache_path("lqr_gains.npz") (param.GainCacheFile).
+
+cache_path() gives a file in the per-user cache directory ($XDG_CACHE_HOME
+or ~/.cache, under rwip/), so scripts do not leave cache files in the
+working directory.
+
+Files carry a format number (FORMAT); a file written in another layout,
+such as the keys/gains arrays of the first gain cache, is ignored and
+overwritten on the next save instead of being misread.
+
+Usage:
+    from cache import ResultCache, cache_path, result_key
+
+    cache = ResultCache(cache_path("bifurcation.npz"))
+    key = result_key(F=133.5, delt=0.0, w=20, points=200)
+    if key not in cache:
+        cache[key] = compute(...)
+    cache.save()
+
+"""
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+
+def cache_path(name):
+    """Path of the cache file `name` in the per-user cache directory; save() creates the directory."""
+    folder = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "rwip")
+    return os.path.join(folder, name)
+
+
+def result_key(**inputs):
+    """Hex digest of the named inputs (numbers, strings or arrays), independent of their order."""
+    h = hashlib.sha1()
+    for name in sorted(inputs):
+        value = inputs[name]
+        h.update(name.encode())
+        h.update(value.encode() if isinstance(value, str) else np.ascontiguousarray(value, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+FORMAT = 1  # Layout of the .npz file: one array per key plus the _FORMAT_KEY entry
+_FORMAT_KEY = "__format__"
+
+_UMASK = os.umask(0)  # Read once; os.umask can only read the mask by setting it
+os.umask(_UMASK)
+
+
+class ResultCache:
+    """Dict of key -> array, optionally stored in an .npz file."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._results = {}
+        if path is not None and os.path.exists(path):
+            self._results.update(self._read(path))
+
+    def __len__(self):
+        return len(self._results)
+
+    def __contains__(self, key):
+        return key in self._results
+
+    def __getitem__(self, key):
+        return self._results[key]
+
+    def __setitem__(self, key, value):
+        self._results[key] = np.asarray(value)
+
+    def clear(self):
+        self._results.clear()
+
+    def missing(self, keys):
+        """Keys not in the cache, without duplicates; counts hits and misses."""
+        missing = [key for key in dict.fromkeys(keys) if key not in self._results]
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+        return missing
+
+    def save(self, path=None):
+        """Write the cache, merged with what is already in the file."""
+        path = path or self.path
+        if path is None:
+            return
+        results = self._read(path) if os.path.exists(path) else {}
+        results.update(self._results)
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix=".npz", dir=folder)
+        os.fchmod(fd, 0o666 & ~_UMASK)  # mkstemp creates the file 0600
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **results, **{_FORMAT_KEY: FORMAT})
+        os.replace(tmp, path)  # readers never see a half-written file
+
+    @staticmethod
+    def _read(path):
+        """Results in the file, or {} when it is in another format."""
+        with np.load(path) as data:
+            if _FORMAT_KEY not in data.files or int(data[_FORMAT_KEY]) != FORMAT:
+                return {}
+            return {key: data[key] for key in data.files if key != _FORMAT_KEY}
@@ -10,6 +10,9 @@ D. D. Nolte, Introduction to Modern Dynamics: Chaos, Networks, Space and Time, 2
 import numpy as np
 from scipy import integrate
 from matplotlib import pyplot as plt
+from poincare import time_section
+from batch_ode import solve_batch
+from kapitza import flow_batch
  
 plt.close('all')
  
@@ -57,24 +60,14 @@ plt.setp(lines, linewidth=0.5)
 plt.show()
 plt.title('Speed')
  
-repnum = 5000
-px = np.zeros(shape=(2*repnum,))
-xvar = np.zeros(shape=(2*repnum,))
-cnt = -1
-testwt = np.mod(t,T)-0.5*T;
-last = testwt[1]
-for loop in range(2,siz-1):
-    if (last < 0)and(testwt[loop] > 0):
-        cnt = cnt+1
-        del1 = -testwt[loop-1]/(testwt[loop] - testwt[loop-1])
-        px[cnt] = (y2[loop]-y2[loop-1])*del1 + y2[loop-1]
-        xvar[cnt] = (y1[loop]-y1[loop-1])*del1 + y1[loop-1]
-        last = testwt[loop]
-    else:
-        last = testwt[loop]
+# First return map at t = (k + 1/2) T, interpolated between the samples;
+# poincare.strobe(flow_deriv, x_y_z, T, n) gives the section states directly
+_, section = time_section(t, x_t, T)
+xvar = section[:,0]
+px = section[:,1]
   
 plt.figure(3)
-lines = plt.plot(xvar[0:5000],px[0:5000],'ko',ms=1)
+lines = plt.plot(xvar,px,'ko',ms=1)
 plt.show()
 plt.title('First Return Map')
  
@@ -82,4 +75,15 @@ plt.figure(4)
 lines = plt.plot(x_t[0:1000,0]/np.pi,y2[0:1000])
 plt.setp(lines, linewidth=0.5)
 plt.show()
-plt.title('Phase Space')
\ No newline at end of file
+plt.title('Phase Space')
+ 
+# Return maps of several starting angles in one batched call, sampled exactly at t = (k + 1/2) T
+x0s = np.pi + np.linspace(0.05, 0.6, 12)
+y0s = np.column_stack([x0s, np.zeros_like(x0s), np.zeros_like(x0s)])
+t_sections = np.concatenate(([0], (np.arange(200) + 0.5)*T))
+sections = solve_batch(flow_batch, y0s, t_sections, args=(F, delt, w), rtol=1e-8, atol=1e-8)[1:]
+
+plt.figure(5)
+lines = plt.plot(sections[:,:,0],sections[:,:,1],'o',ms=1)
+plt.show()
+plt.title('First Return Maps, several starting angles')
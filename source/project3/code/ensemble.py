@@ -0,0 +1,172 @@
+"""
+Reaction Wheel Inverted Pendulum - vectorized ensemble
+
+Steps N pendulums at once with NumPy arrays, including the Bang-bang, brake
+and LQR/PID mode switching of the hybrid controller. Any parameter of the
+param module can be given as a 1-D array of length N (one value per
+pendulum), e.g. to sweep init_qp, masses or disturbance torques.
+
+Usage:
+    import numpy as np
+    import param
+    from rwip import make_params
+    from ensemble import simulate_ensemble
+
+    p = make_params(param, init_qp=np.linspace(150, 210, 10000))
+    state = simulate_ensemble(p, t_end=10.0, dt=1e-3)
+    state.qp, state.mode, ...
+
+"""
+
+import numpy as np
+
+from gains import get_cache
+from rwip import MODES, make_params
+
+# Parameters that change the LQR gain when given per pendulum
+GAIN_PARAMS = ("m1", "m2", "L1", "L2", "I1", "g", "J", "Ng", "ke", "kt", "R", "R_LQR")
+
+BANG_BANG, BRAKE = MODES.index("Bang-bang"), MODES.index("brake")
+
+
+class EnsembleState:
+    """State of N pendulums, one NumPy array per variable."""
+
+    __slots__ = ("qp", "qp_d", "qr", "qr_d", "curr_prev", "curr_d", "Tm", "Vin",
+                 "setpoint", "mode", "settled_flag", "wait_flag")
+
+    def __init__(self, qp, qp_d, qr, qr_d):
+        qp, qp_d, qr, qr_d = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (qp, qp_d, qr, qr_d)))
+        self.qp, self.qp_d, self.qr, self.qr_d = qp.copy(), qp_d.copy(), qr.copy(), qr_d.copy()
+        n = self.qp.shape
+        self.curr_prev = np.zeros(n)
+        self.curr_d = np.zeros(n)
+        self.Tm = np.zeros(n)
+        self.Vin = np.zeros(n)
+        self.setpoint = np.zeros(n)
+        self.mode = np.full(n, BANG_BANG, dtype=np.int8)
+        self.settled_flag = np.zeros(n, dtype=bool)
+        self.wait_flag = np.zeros(n, dtype=bool)
+
+    @classmethod
+    def from_params(cls, params, n=None):
+        """Initial state from the init_* values of params (scalars or arrays)."""
+        state = cls(np.deg2rad(params.init_qp), params.init_qp_d, params.init_qr, params.init_qr_d)
+        if n is not None and state.qp.shape != (n,):
+            state = cls(*(np.broadcast_to(v, (n,)) for v in (state.qp, state.qp_d, state.qr, state.qr_d)))
+        return state
+
+    def __len__(self):
+        return self.qp.size
+
+
+def ensemble_size(params):
+    """Number of pendulums implied by the 1-D array parameters (1 if none)."""
+    sizes = {np.size(v) for v in vars(params).values() if np.ndim(v) == 1}
+    if len(sizes) > 1:
+        raise ValueError(f"Per-pendulum parameters have different lengths: {sorted(sizes)}")
+    return sizes.pop() if sizes else 1
+
+
+def ensemble_gains(params, n):
+    """LQR gains (N, 4) for the ensemble, one Riccati solve per distinct parameter set."""
+    cache = get_cache(getattr(params, "GainCacheFile", None))
+    varying = [k for k in GAIN_PARAMS if np.ndim(getattr(params, k)) == 1]
+    if not varying:
+        return np.broadcast_to(cache.gain(params), (n, 4))
+    table = np.column_stack([np.broadcast_to(getattr(params, k), (n,)) for k in varying])
+    unique, inverse = np.unique(table, axis=0, return_inverse=True)
+    gains = cache.gains([make_params(params, **dict(zip(varying, row))) for row in unique])
+    return gains[inverse.ravel()]
+
+
+def ensemble_energy(params, qp, qp_d):
+    """Vectorized PendulumEnergy."""
+    p = params
+    K = 0.5 * (p.m1 * p.L1**2 + p.m2 * p.L2**2 + p.J + p.I1) * qp_d * qp_d  # Kinetic energy
+    P = (p.m1 + p.m2) * p.g * p.L2 * np.cos(qp)  # Potential energy
+    return K + P
+
+
+def ensemble_controller(state, params, K, stabilizer):
+    """Hybrid controller for all pendulums, returns Vin and updates the mode flags."""
+    p = params
+    qp, qp_d = state.qp, state.qp_d
+
+    setpoint_offset = (qp - np.pi) / (2 * np.pi)
+    state.setpoint = np.where(setpoint_offset < 0, (np.floor(setpoint_offset) + 1) * 2 * np.pi,
+                              np.where(setpoint_offset > 0, np.ceil(setpoint_offset) * 2 * np.pi, state.setpoint))
+
+    E = ensemble_energy(p, qp, qp_d)
+    reqE = (p.m1 + p.m2) * p.g * p.L2
+    bound = np.deg2rad(p.StabilizeBound)
+    wrapped = np.abs(qp) % (2 * np.pi)
+    inside = (wrapped <= bound) | (wrapped >= 2 * np.pi - bound)
+
+    # Same branches as the scalar controller: brake / stabilize / swing-up
+    braking = state.wait_flag
+    stabilize = ~braking & inside
+    swing = ~braking & ~inside
+    start_wait = swing & state.settled_flag
+    state.wait_flag = (braking & ~(np.abs(E) < 0.05)) | start_wait
+    state.settled_flag = (state.settled_flag | stabilize) & ~start_wait
+
+    stab_mode = MODES.index(stabilizer)
+    mode = np.where(braking, BRAKE, state.mode)
+    mode = np.where(stabilize, stab_mode, mode)
+    state.mode = np.where(swing & ~start_wait, BANG_BANG, mode).astype(np.int8)
+
+    e = state.setpoint - qp
+    if stabilizer == "LQR":
+        v_stab = e * K[:, 0] + qp_d * -K[:, 1]
+    else:
+        v_stab = -e * p.Kp
+    v_bang = np.where((qp_d < 0) == (E < reqE), 12.0, -12.0)
+    v_brake = np.where(qp_d < 0, -12.0, 12.0)
+    return np.select([state.mode == BANG_BANG, state.mode == BRAKE, state.mode == stab_mode],
+                     [v_bang, v_brake, v_stab], 0.0)
+
+
+def ensemble_step(state, params, dt, Tp=0.0, K=None, stabilizer=None):
+    """Advance all pendulums by one Euler step of dt, in place."""
+    p = params
+    stabilizer = stabilizer or p.Stabilize_Controller
+    Vin = ensemble_controller(state, p, K, stabilizer)
+    Vin = np.where(np.asarray(p.MotorLimit, dtype=bool), np.clip(Vin, -24, 24), Vin)  # MotorLimit may be per pendulum
+
+    # Motor
+    curr = (Vin - (state.qr_d * p.ke) - (p.L * state.curr_d)) / p.R
+    state.curr_d = (curr - state.curr_prev) / dt
+    state.Tm = curr * p.kt
+    state.qr_d = state.qr_d + ((state.Tm - p.B * state.qr_d) / p.J) * dt
+    state.qr = state.qr + (state.qr_d * dt)
+    state.curr_prev = curr
+    state.Vin = Vin
+
+    # Pendulum
+    qp_dd = (
+        ((p.m1 * p.L1 + p.m2 * p.L2) * p.g * np.sin(state.qp)) - state.Tm + Tp - p.dp * state.qp_d
+    ) / ((p.m1 * p.L1**2.0) + (p.m2 * p.L2) + p.I1)
+    state.qp_d = state.qp_d + (qp_dd * dt)
+    state.qp = state.qp + (state.qp_d * dt)
+    return state
+
+
+def simulate_ensemble(params, t_end=10.0, dt=1e-3, state=None, disturbance=None, K=None, stabilizer=None):
+    """Run all pendulums of the ensemble for t_end seconds and return the final state.
+
+    disturbance is a constant torque Tp (scalar or array of length N) or a
+    callable ``disturbance(t) -> Tp``; by default no torque is applied.
+    """
+    n = ensemble_size(params)
+    if state is None:
+        state = EnsembleState.from_params(params, n)
+    stabilizer = stabilizer or params.Stabilize_Controller
+    if K is None and stabilizer == "LQR":
+        K = ensemble_gains(params, len(state))
+    Tp = 0.0 if disturbance is None else disturbance
+    for k in range(int(round(t_end / dt))):
+        if callable(disturbance):
+            Tp = disturbance(k * dt)
+        ensemble_step(state, params, dt, Tp, K, stabilizer)
+    return state
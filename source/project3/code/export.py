@@ -0,0 +1,220 @@
+"""
+Reaction Wheel Inverted Pendulum - trajectory export
+
+Streaming writer for trajectories in a compressed columnar file, chosen by
+extension:
+
+    .parquet / .pq      Parquet, one row group per chunk (pyarrow)
+    .arrow / .feather   Arrow IPC file, one record batch per chunk (pyarrow)
+    .h5 / .hdf5         HDF5, one resizable chunked dataset per column (h5py)
+
+Rows are collected in a preallocated chunk and written when it is full, so
+the writer can take one row per physics step from the GUI loop as well as
+whole simulate() results from headless runs. pyarrow and h5py are only
+imported for the format that is used.
+
+iter_chunks() reads a file back one chunk at a time (Arrow IPC files are
+memory-mapped, without copies when written with compression=None), so
+multi-GB sweep outputs can be analysed without loading them at once.
+
+Usage:
+    from export import TrajectoryWriter, read_trajectory, write_trajectory
+
+    with TrajectoryWriter("run.parquet") as writer:
+        writer.append(t, qp, qp_d, qr, qr_d, Tm, Vin, Tp, setpoint, mode)
+
+    write_trajectory("trial.arrow", simulate(param))
+    data = read_trajectory("run.parquet", columns=("t", "qp"))
+
+"""
+
+import os
+
+import numpy as np
+
+from rwip import COLUMNS, MODES
+
+EXPORT_COLUMNS = COLUMNS + ("mode",)
+FORMATS = {".parquet": "parquet", ".pq": "parquet", ".arrow": "arrow", ".feather": "arrow",
+           ".h5": "hdf5", ".hdf5": "hdf5"}
+INTEGER_COLUMNS = {"mode": np.int8, "trial": np.int64}
+
+
+def file_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"Unknown trajectory format {ext!r}, expected one of {sorted(FORMATS)}")
+    return FORMATS[ext]
+
+
+def _arrow_schema(dtype):
+    import pyarrow as pa
+
+    metadata = {"modes": ",".join(MODES)}
+    return pa.schema([(name, pa.from_numpy_dtype(dtype[name])) for name in dtype.names], metadata=metadata)
+
+
+class _ParquetSink:
+    def __init__(self, path, dtype, compression):
+        import pyarrow.parquet as pq
+
+        self.schema = _arrow_schema(dtype)
+        self.writer = pq.ParquetWriter(path, self.schema, compression=compression or "none")
+
+    def write(self, chunk):
+        import pyarrow as pa
+
+        self.writer.write_table(pa.Table.from_arrays([chunk[name] for name in chunk.dtype.names], schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+class _ArrowSink:
+    def __init__(self, path, dtype, compression):
+        import pyarrow as pa
+
+        self.schema = _arrow_schema(dtype)
+        self.file = pa.OSFile(path, "wb")
+        self.writer = pa.ipc.new_file(self.file, self.schema, options=pa.ipc.IpcWriteOptions(compression=compression))
+
+    def write(self, chunk):
+        import pyarrow as pa
+
+        self.writer.write_batch(pa.RecordBatch.from_arrays([chunk[name] for name in chunk.dtype.names],
+                                                           schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+        self.file.close()
+
+
+class _Hdf5Sink:
+    def __init__(self, path, dtype, compression, chunk_size):
+        import h5py
+
+        self.file = h5py.File(path, "w")
+        self.file.attrs["modes"] = ",".join(MODES)
+        self.file.attrs["columns"] = ",".join(dtype.names)
+        # HDF5 has no built-in zstd, any compression maps to gzip
+        for name in dtype.names:
+            self.file.create_dataset(name, shape=(0,), maxshape=(None,), dtype=dtype[name], chunks=(chunk_size,),
+                                     compression="gzip" if compression else None)
+
+    def write(self, chunk):
+        for name in chunk.dtype.names:
+            dataset = self.file[name]
+            start = dataset.shape[0]
+            dataset.resize((start + len(chunk),))
+            dataset[start:] = chunk[name]
+
+    def close(self):
+        self.file.close()
+
+
+class TrajectoryWriter:
+    """Appends trajectory rows to a columnar file in chunks of chunk_size rows.
+
+    columns defaults to the rwip.simulate() columns plus mode; mode (and an
+    optional trial column) are stored as integers, everything else as float64.
+    """
+
+    def __init__(self, path, columns=EXPORT_COLUMNS, chunk_size=65536, compression="zstd"):
+        self.path = path
+        self.columns = tuple(columns)
+        self.dtype = np.dtype([(name, INTEGER_COLUMNS.get(name, np.float64)) for name in self.columns])
+        self.rows = 0
+        self._chunk = np.empty(chunk_size, dtype=self.dtype)
+        self._n = 0
+        fmt = file_format(path)
+        if fmt == "parquet":
+            self._sink = _ParquetSink(path, self.dtype, compression)
+        elif fmt == "arrow":
+            self._sink = _ArrowSink(path, self.dtype, compression)
+        else:
+            self._sink = _Hdf5Sink(path, self.dtype, compression, chunk_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, *values):
+        """One row, values in column order."""
+        self._chunk[self._n] = values
+        self._n += 1
+        self.rows += 1
+        if self._n == len(self._chunk):
+            self.flush()
+
+    def append_columns(self, data):
+        """Many rows from a dict of equal-length arrays (e.g. a simulate() result)."""
+        n = len(data[self.columns[0]])
+        start = 0
+        while start < n:
+            count = min(len(self._chunk) - self._n, n - start)
+            rows = self._chunk[self._n:self._n + count]
+            for name in self.columns:
+                rows[name] = data[name][start:start + count]
+            self._n += count
+            self.rows += count
+            start += count
+            if self._n == len(self._chunk):
+                self.flush()
+
+    def flush(self):
+        """Write the rows collected so far."""
+        if self._n:
+            self._sink.write(self._chunk[:self._n])
+            self._n = 0
+
+    def close(self):
+        if self._sink is not None:
+            self.flush()
+            self._sink.close()
+            self._sink = None
+
+
+def write_trajectory(path, data, columns=EXPORT_COLUMNS, **options):
+    """Write a whole trajectory (dict of arrays) in one call."""
+    with TrajectoryWriter(path, columns, **options) as writer:
+        writer.append_columns(data)
+
+
+def iter_chunks(path, columns=None):
+    """Dicts of NumPy arrays, one per row group / record batch / HDF5 chunk."""
+    fmt = file_format(path)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path, memory_map=True)
+        for i in range(parquet.num_row_groups):
+            table = parquet.read_row_group(i, columns=list(columns) if columns else None)
+            yield {name: table[name].to_numpy() for name in table.column_names}
+    elif fmt == "arrow":
+        import pyarrow as pa
+
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                names = columns or batch.schema.names
+                yield {name: batch.column(name).to_numpy(zero_copy_only=False) for name in names}
+    else:
+        import h5py
+
+        with h5py.File(path, "r") as f:
+            names = columns or f.attrs["columns"].split(",")
+            n = f[names[0]].shape[0]
+            step = f[names[0]].chunks[0] if f[names[0]].chunks else n
+            for start in range(0, n, step):
+                yield {name: f[name][start:start + step] for name in names}
+
+
+def read_trajectory(path, columns=None):
+    """Whole file as a dict of NumPy arrays."""
+    chunks = list(iter_chunks(path, columns))
+    if not chunks:
+        return {}
+    return {name: np.concatenate([c[name] for c in chunks]) for name in chunks[0]}
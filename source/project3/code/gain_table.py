@@ -0,0 +1,130 @@
+"""
+Reaction Wheel Inverted Pendulum - gain-scheduled LQR table
+
+LQR gains precomputed on a grid of wheel radius, wheel density and pendulum
+length, with the wheel and pendulum masses and inertias derived as in
+simulation.py. Lookups interpolate the table trilinearly, so K for a new
+geometry costs microseconds instead of a Riccati solve.
+
+The error estimate compares the table with exact gains at the centre of each
+grid cell, where linear interpolation is worst; error() returns that
+relative error for the cell a query falls in.
+
+Usage:
+    import numpy as np
+    import param
+    from gain_table import GainTable
+
+    table = GainTable.build(param, wheelradius=np.linspace(0.1, 0.4, 13),
+                            wheelrho=np.linspace(800, 1600, 9), length=np.linspace(0.2, 0.8, 13))
+    K = table(0.3, 1250, 0.5)            # (4,), also works with arrays
+    table.error(0.3, 1250, 0.5), table.max_error
+    table.save("gain_table.npz")
+
+"""
+
+from bisect import bisect_right
+
+import numpy as np
+
+from gains import get_cache
+from rwip import make_params
+
+AXES = ("wheelradius", "wheelrho", "length")
+
+
+def geometry_params(base, wheelradius, wheelrho, length, wheelheight=0.01, motormass=0.1):
+    """Parameters for a wheel and pendulum geometry, derived as in simulation.py."""
+    m2 = 3.14 * wheelradius**2 * wheelheight * wheelrho + motormass  # Wheel plus motor (kg)
+    I2 = 0.5 * m2 * wheelradius**2
+    return make_params(base, wheelradius=wheelradius, m2=m2, I2=I2,
+                       L1=length, L2=length, m1=m2, I1=m2 * length**2)
+
+
+def exact_gains(base, points, **geometry):
+    """LQR gains (N, 4) for (N, 3) points of (wheelradius, wheelrho, length)."""
+    cache = get_cache(getattr(base, "GainCacheFile", None))
+    return cache.gains([geometry_params(base, *point, **geometry) for point in np.asarray(points, dtype=float)])
+
+
+class GainTable:
+    """Trilinear interpolation of K over (wheelradius, wheelrho, length)."""
+
+    def __init__(self, axes, gains, cell_error=None):
+        self.axes = tuple(np.asarray(a, dtype=float) for a in axes)
+        self._lists = tuple(a.tolist() for a in self.axes)  # for the scalar lookup
+        self.gains = np.asarray(gains, dtype=float)
+        self.cell_error = cell_error
+        self.max_error = float(np.max(cell_error)) if cell_error is not None else np.nan
+
+    @classmethod
+    def build(cls, base, wheelradius, wheelrho, length, **geometry):
+        """Solve the gains on the grid nodes and estimate the error at the cell centres."""
+        axes = tuple(np.asarray(a, dtype=float) for a in (wheelradius, wheelrho, length))
+        shape = tuple(len(a) for a in axes)
+        if min(shape) < 2:
+            raise ValueError("every axis needs at least two values")
+
+        nodes = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+        table = cls(axes, exact_gains(base, nodes, **geometry).reshape(shape + (4,)))
+
+        centres = [0.5 * (a[1:] + a[:-1]) for a in axes]
+        points = np.stack(np.meshgrid(*centres, indexing="ij"), axis=-1).reshape(-1, 3)
+        exact = exact_gains(base, points, **geometry)
+        error = np.abs(table(*points.T) - exact).max(axis=1) / np.abs(exact).max(axis=1)
+        table.cell_error = error.reshape(tuple(n - 1 for n in shape))
+        table.max_error = float(error.max())
+        return table
+
+    def _locate(self, values):
+        """Cell index and fraction along each axis, clamped to the table."""
+        cells, fractions = [], []
+        for axis, x in zip(self.axes, values):
+            x = np.clip(np.asarray(x, dtype=float), axis[0], axis[-1])
+            i = np.clip(np.searchsorted(axis, x, side="right") - 1, 0, len(axis) - 2)
+            cells.append(i)
+            fractions.append((x - axis[i]) / (axis[i + 1] - axis[i]))
+        return cells, fractions
+
+    def __call__(self, wheelradius, wheelrho, length):
+        """Interpolated K, shape (..., 4); values outside the table are clamped."""
+        if np.ndim(wheelradius) == np.ndim(wheelrho) == np.ndim(length) == 0:
+            return self._lookup(wheelradius, wheelrho, length)
+        (i, j, k), (u, v, w) = self._locate((wheelradius, wheelrho, length))
+        G = self.gains
+        u, v, w = u[..., None], v[..., None], w[..., None]
+        c00 = G[i, j, k] * (1 - u) + G[i + 1, j, k] * u
+        c01 = G[i, j, k + 1] * (1 - u) + G[i + 1, j, k + 1] * u
+        c10 = G[i, j + 1, k] * (1 - u) + G[i + 1, j + 1, k] * u
+        c11 = G[i, j + 1, k + 1] * (1 - u) + G[i + 1, j + 1, k + 1] * u
+        return (c00 * (1 - v) + c10 * v) * (1 - w) + (c01 * (1 - v) + c11 * v) * w
+
+    def _lookup(self, *values):
+        """Scalar fast path of __call__ for online gain scheduling."""
+        cube = self.gains
+        for axis, x in zip(self._lists, values):
+            x = min(max(float(x), axis[0]), axis[-1])
+            i = min(max(bisect_right(axis, x) - 1, 0), len(axis) - 2)
+            f = (x - axis[i]) / (axis[i + 1] - axis[i])
+            cube = cube[i] * (1 - f) + cube[i + 1] * f
+        return cube
+
+    def error(self, wheelradius, wheelrho, length):
+        """Estimated relative error of K at the query, inf outside the table."""
+        if self.cell_error is None:
+            raise ValueError("GainTable was built without error estimates, use GainTable.build() for error()")
+        values = (wheelradius, wheelrho, length)
+        (i, j, k), _ = self._locate(values)
+        error = self.cell_error[i, j, k]
+        inside = np.all([(np.asarray(x) >= a[0]) & (np.asarray(x) <= a[-1]) for a, x in zip(self.axes, values)], axis=0)
+        return np.where(inside, error, np.inf)
+
+    def save(self, path):
+        errors = {} if self.cell_error is None else {"cell_error": self.cell_error}
+        np.savez(path, gains=self.gains, **errors, **dict(zip(AXES, self.axes)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls([data[name] for name in AXES], data["gains"],
+                       data["cell_error"] if "cell_error" in data.files else None)
@@ -0,0 +1,140 @@
+"""
+Reaction Wheel Inverted Pendulum - LQR gain cache
+
+Memoizes LQR gains on a hash of the physical parameters and LQR weights, so
+a sweep over masses or motor constants solves each Riccati equation once.
+Missing gains are solved in one batch: the Hamiltonian matrices of all
+missing parameter sets go through a single stacked eigendecomposition, with
+a per-set scipy CARE solve as fallback when the residual is poor. With a
+path the cache is kept in an .npz file between runs (cache.ResultCache).
+
+Usage:
+    import param
+    from cache import cache_path
+    from gains import GainCache, get_cache
+    from rwip import make_params
+
+    cache = get_cache(param.GainCacheFile)                        # shared, kept in cache_path("lqr_gains.npz")
+    cache = GainCache(cache_path("my_gains.npz"))                 # a file of its own
+    cache = GainCache()                                           # in memory only
+    K = cache.gain(param)                                         # (1, 4)
+    Ks = cache.gains([make_params(param, m2=m) for m in masses])  # (N, 4)
+
+"""
+
+import hashlib
+
+import numpy as np
+
+from cache import ResultCache
+from rwip import system_matrices
+
+# Parameters the gain depends on, in key order
+KEY_PARAMS = ("m1", "m2", "L1", "L2", "I1", "g", "J", "Ng", "ke", "kt", "R", "Q_LQR", "R_LQR", "N_LQR")
+
+RESIDUAL_TOL = 1e-8  # Relative Riccati residual accepted from the batched solve
+
+
+def gain_key(params):
+    """Hex digest identifying the LQR problem of params."""
+    h = hashlib.sha1()
+    for name in KEY_PARAMS:
+        h.update(np.ascontiguousarray(getattr(params, name), dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+def weights(params):
+    """Q (4x4), R (1x1) and N (4x1) as float arrays."""
+    Q = np.asarray(params.Q_LQR, dtype=float).reshape(4, 4)
+    R = np.asarray(params.R_LQR, dtype=float).reshape(1, 1)
+    N = np.asarray(params.N_LQR, dtype=float).reshape(4, 1)
+    return Q, R, N
+
+
+def solve_gains(A, B, Q, R, N):
+    """LQR gains (M, 1, 4) for stacked problems A (M, 4, 4), B (M, 4, 1), Q, R, N.
+
+    Same result as control.lqr: the stable invariant subspace of the
+    Hamiltonian gives S, and K = R^-1 (B'S + N').
+    """
+    n = A.shape[-1]
+    Rinv = np.linalg.inv(R)
+    Bt = np.swapaxes(B, -1, -2)
+    Nt = np.swapaxes(N, -1, -2)
+    Ac = A - B @ Rinv @ Nt
+    Qc = Q - N @ Rinv @ Nt
+    H = np.block([[Ac, -B @ Rinv @ Bt], [-Qc, -np.swapaxes(Ac, -1, -2)]])
+
+    w, V = np.linalg.eig(H)
+    stable = np.argsort(w.real, axis=-1)[..., :n]
+    V = np.take_along_axis(V, stable[..., None, :], axis=-1)
+    with np.errstate(all="ignore"):
+        S = np.real(V[..., n:, :] @ np.linalg.pinv(V[..., :n, :]))
+    S = 0.5 * (S + np.swapaxes(S, -1, -2))
+
+    residual = (np.swapaxes(A, -1, -2) @ S + S @ A - (S @ B + N) @ Rinv @ (Bt @ S + Nt) + Q)
+    scale = np.abs(Q).max(axis=(-2, -1)) + np.abs(S).max(axis=(-2, -1)) * np.abs(A).max(axis=(-2, -1))
+    bad = ~(np.abs(residual).max(axis=(-2, -1)) <= RESIDUAL_TOL * scale)
+    if bad.any():
+        from scipy.linalg import solve_continuous_are
+
+        for i in np.flatnonzero(bad):
+            S[i] = solve_continuous_are(A[i], B[i], Q[i], R[i], s=N[i])
+    return Rinv @ (Bt @ S + Nt)
+
+
+class GainCache:
+    """LQR gains keyed on gain_key(params), optionally stored in an .npz file."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._gains = ResultCache(path)
+
+    @property
+    def hits(self):
+        return self._gains.hits
+
+    @property
+    def misses(self):
+        return self._gains.misses
+
+    def __len__(self):
+        return len(self._gains)
+
+    def __contains__(self, params):
+        return gain_key(params) in self._gains
+
+    def gain(self, params):
+        """LQR gain K (1x4) of params."""
+        return self.gains([params])[0][None, :]
+
+    def gains(self, params_list):
+        """LQR gains (N, 4), solving all missing ones in one batch."""
+        keys = [gain_key(p) for p in params_list]
+        by_key = dict(zip(keys, params_list))  # equal keys, equal problems
+        missing = {key: by_key[key] for key in self._gains.missing(keys)}
+
+        if missing:
+            problems = [system_matrices(p) + weights(p) for p in missing.values()]
+            A, B, Q, R, N = (np.array(m, dtype=float) for m in zip(*problems))
+            for key, K in zip(missing, solve_gains(A, B, Q, R, N)):
+                self._gains[key] = K[0]
+            self.save()
+        return np.array([self._gains[key] for key in keys]).reshape(len(keys), 4)
+
+    def clear(self):
+        self._gains.clear()
+
+    def save(self, path=None):
+        """Write the cache, merged with what is already in the file."""
+        self._gains.save(path)
+
+
+_caches = {}
+
+
+def get_cache(path=None):
+    """Shared GainCache for path (None for memory only)."""
+    if path not in _caches:
+        _caches[path] = GainCache(path)
+    return _caches[path]
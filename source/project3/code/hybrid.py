@@ -0,0 +1,189 @@
+"""
+Reaction Wheel Inverted Pendulum - event-driven hybrid simulation
+
+Integrates the continuous model of integrators.py with the hybrid
+controller as a hybrid automaton: between switches Vin is a smooth function
+of the state and the solver takes steps as large as its tolerances allow;
+the guards are solve_ivp events, located by root finding, so the switching
+times do not depend on a step size.
+
+Guards per mode:
+
+    Bang-bang   qp_d = 0, E = reqE (sign of Vin), entering StabilizeBound
+    brake       qp_d = 0 (sign of Vin), |E| = 0.05 (end of braking)
+    LQR/PID     leaving StabilizeBound
+
+The Bang-bang law slides on E = reqE, where the switches would pile up. After
+a guard fires it is ignored for min_dwell seconds (the other guards stay
+active), which bounds the switching rate like the sample time of the
+discrete controller does.
+
+Usage:
+    import param
+    from hybrid import simulate_hybrid
+
+    out = simulate_hybrid(param, t_end=10.0, dt_out=1e-2)
+    out["t"], out["qp"], out["mode"], ...
+    for t, guard, before, after in out["switches"]: ...
+
+"""
+
+import math
+
+import numpy as np
+from scipy.integrate import OdeSolution, solve_ivp
+
+from gains import get_cache
+from integrators import model_constants, rwip_rhs
+from rwip import COLUMNS, MODES, RwipState, pendulum_energy
+
+GUARDS = ("qp_d", "energy", "bound", "calm")
+
+
+def _guards(p, reqE, bound):
+    """Guard functions g(t, x) by name; a switch happens where g crosses zero."""
+    two_pi = 2 * math.pi
+    return {
+        "qp_d": lambda t, x: x[1],
+        "energy": lambda t, x: pendulum_energy(p, x[0], x[1]) - reqE,
+        "bound": lambda t, x: bound - abs(x[0] - two_pi * round(x[0] / two_pi)),
+        "calm": lambda t, x: abs(pendulum_energy(p, x[0], x[1])) - 0.05,
+    }
+
+
+def _mode_guards(mode):
+    """(guard, direction) pairs that end a segment in the given mode."""
+    if mode == "Bang-bang":
+        return (("qp_d", 0), ("energy", 0), ("bound", 1))
+    if mode == "brake":
+        return (("qp_d", 0), ("calm", -1))
+    return (("bound", -1),)
+
+
+def simulate_hybrid(params, t_end=10.0, dt_out=1e-2, method="LSODA", x0=None, disturbance=None, stabilizer=None,
+                    K=None, min_dwell=1e-4, **options):
+    """Event-driven run of the hybrid controller on the continuous model.
+
+    Returns the columns of rwip.simulate() sampled every dt_out, plus
+    "switches", a list of (t, guard, mode before, mode after) for every guard
+    crossing, and "sol", an OdeSolution of (qp, qp_d, qr, qr_d, curr) over
+    [0, t_end]. disturbance is a constant Tp or a callable disturbance(t);
+    options (rtol, atol, max_step, ...) are passed to solve_ivp.
+    """
+    p = params
+    c = model_constants(p)
+    stabilizer = stabilizer or p.Stabilize_Controller
+    if K is None and stabilizer == "LQR":
+        K = get_cache(getattr(p, "GainCacheFile", None)).gain(p)
+    K0, K1 = (float(K[0, 0]), float(K[0, 1])) if K is not None else (0.0, 0.0)
+    bound = np.deg2rad(p.StabilizeBound)
+    reqE = (p.m1 + p.m2) * p.g * p.L2
+    limit = 24.0 if p.MotorLimit else math.inf
+    two_pi = 2 * math.pi
+    options.setdefault("rtol", 1e-8)
+    options.setdefault("atol", 1e-10)
+
+    if x0 is None:
+        x0 = RwipState.from_params(p)
+    elif not isinstance(x0, RwipState):
+        x0 = RwipState(*x0)
+    x = np.array([x0.qp, x0.qp_d, x0.qr, x0.qr_d, x0.curr_prev], dtype=float)
+
+    if disturbance is None:
+        disturbance = 0.0
+    torque = disturbance if callable(disturbance) else (lambda t: disturbance)
+
+    guards = _guards(p, reqE, bound)
+
+    def signs_at(x):
+        return (x[1] < 0, pendulum_energy(p, x[0], x[1]) < reqE)
+
+    def voltage(mode, signs, x):
+        if mode == "Bang-bang":
+            Vin = 12.0 if signs[0] == signs[1] else -12.0
+        elif mode == "brake":
+            Vin = -12.0 if signs[0] else 12.0
+        else:
+            e = two_pi * round(x[0] / two_pi) - x[0]
+            Vin = e * K0 - x[1] * K1 if mode == "LQR" else -e * p.Kp
+        return min(max(Vin, -limit), limit)
+
+    def entry_mode(x):
+        return stabilizer if guards["bound"](0.0, x) > 0 else "Bang-bang"
+
+    mode = entry_mode(x)
+    signs = signs_at(x)
+    t, skip, hold_until = 0.0, None, 0.0
+    segments, switches = [], []
+
+    while t < t_end:
+        t_stop = min(t_end, hold_until) if skip else t_end
+        events = []
+        for name, direction in _mode_guards(mode):
+            if name == skip:
+                continue
+            g = guards[name]
+            event = (lambda g: lambda t, y: g(t, y))(g)
+            event.terminal, event.direction, event.name = True, direction, name
+            events.append(event)
+
+        def rhs(t, y, mode=mode, signs=signs):
+            return rwip_rhs(c, y, voltage(mode, signs, y), torque(t))
+
+        sol = solve_ivp(rhs, (t, t_stop), x, method=method, events=events or None, dense_output=True, **options)
+        if not sol.success:
+            raise RuntimeError(f"solve_ivp failed at t = {t:.6g}: {sol.message}")
+        segments.append((t, sol.sol, mode, signs))
+        t, x = sol.t[-1], sol.y[:, -1]
+
+        if sol.status == 1:
+            hits = [(te[0], i) for i, te in enumerate(sol.t_events) if len(te)]
+            t, i = min(hits)
+            x = sol.y_events[i][0]
+            name = events[i].name
+            before = mode
+            if name == "bound":
+                mode = stabilizer if mode == "Bang-bang" else "brake"
+                signs = signs_at(x)
+            elif name == "calm":
+                mode = entry_mode(x)
+                signs = signs_at(x)
+            else:
+                # Side of the guard after the crossing, from the direction the state moves in
+                g = guards[name]
+                f = np.asarray(rwip_rhs(c, x, voltage(mode, signs, x), torque(t)))
+                rising = g(t, x + 1e-7 * f) > g(t, x)
+                k = 0 if name == "qp_d" else 1
+                signs = tuple(not rising if j == k else s for j, s in enumerate(signs))
+            switches.append((t, name, before, mode))
+            skip, hold_until = name, t + min_dwell
+        else:
+            skip = None
+            signs = signs_at(x)
+
+    # Sample the piecewise solution on the output grid
+    n = int(round(t_end / dt_out))
+    times = dt_out * np.arange(1, n + 1)
+    starts = np.array([s[0] for s in segments])
+    which = np.clip(np.searchsorted(starts, times, side="right") - 1, 0, len(segments) - 1)
+    rows = np.empty((n, len(COLUMNS)))
+    modes = np.empty(n, dtype=np.int8)
+    for k, (tk, j) in enumerate(zip(times, which)):
+        _, dense, seg_mode, seg_signs = segments[j]
+        y = dense(tk)
+        setpoint = two_pi * round(y[0] / two_pi)
+        rows[k] = (tk, y[0], y[1], y[2], y[3], c.kt * y[4], voltage(seg_mode, seg_signs, y), torque(tk), setpoint)
+        modes[k] = MODES.index(seg_mode)
+
+    out = {name: rows[:, i].copy() for i, name in enumerate(COLUMNS)}
+    out["mode"] = modes
+    out["switches"] = switches
+    ts = [segments[0][1].ts[0]]
+    interpolants = []
+    for _, dense, _, _ in segments:
+        if dense.ts[-1] > ts[-1]:
+            keep = dense.ts[1:] > ts[-1]
+            ts.extend(dense.ts[1:][keep])
+            interpolants.extend(np.array(dense.interpolants, dtype=object)[keep])
+    out["sol"] = OdeSolution(np.array(ts), interpolants)
+    return out
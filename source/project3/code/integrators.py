@@ -0,0 +1,195 @@
+"""
+Reaction Wheel Inverted Pendulum - integrators
+
+Continuous-time RWIP model with the motor current as a state,
+x = (qp, qp_d, qr, qr_d, curr):
+
+    L curr_d = Vin - ke qr_d - R curr
+    J qr_dd  = kt curr - B qr_d
+    qp_dd    = (grav sin(qp) - kt curr + Tp - dp qp_d) / inertia
+
+and a set of integrators for it. The electrical pole -R/L (about -7600 1/s)
+is what limits explicit schemes; "semi-implicit" and "exponential" treat it
+implicitly/exactly so the step is only limited by the mechanics.
+
+Fixed step:  "semi-implicit", "rk4", "exponential"
+Adaptive:    "RK45", "Radau", "BDF", "LSODA" (scipy solve_ivp, dense output)
+
+The controller is sampled every dt and held constant over the step (zero-order
+hold), as on the real hardware.
+
+Usage:
+    import param
+    from rwip import simulate
+
+    out = simulate(param, None, t_end=10.0, dt=5e-3, method="exponential")
+
+"""
+
+import math
+import types
+
+import numpy as np
+
+from rwip import COLUMNS, MODES, HybridController, RwipState, step
+
+FIXED_STEP = ("semi-implicit", "rk4", "exponential")
+ADAPTIVE = ("RK45", "Radau", "BDF", "LSODA")
+METHODS = ("euler",) + FIXED_STEP + ADAPTIVE
+
+
+def model_constants(params):
+    """Precomputed coefficients of the continuous model."""
+    p = params
+    return types.SimpleNamespace(
+        ke=p.ke, kt=p.kt, R=p.R, L=p.L, B=p.B, J=p.J, dp=p.dp,
+        grav=(p.m1 * p.L1 + p.m2 * p.L2) * p.g,
+        inertia=(p.m1 * p.L1**2.0) + (p.m2 * p.L2) + p.I1,
+    )
+
+
+def rwip_rhs(c, x, Vin, Tp):
+    """Time derivative of x = (qp, qp_d, qr, qr_d, curr)."""
+    qp, qp_d, qr, qr_d, curr = x
+    Tm = c.kt * curr
+    return (
+        qp_d,
+        (c.grav * math.sin(qp) - Tm + Tp - c.dp * qp_d) / c.inertia,
+        qr_d,
+        (Tm - c.B * qr_d) / c.J,
+        (Vin - c.ke * qr_d - c.R * curr) / c.L,
+    )
+
+
+# ==========================================================================================
+# ===================================== FIXED STEP =========================================
+# ==========================================================================================
+def semi_implicit_step(c, x, Vin, Tp, dt):
+    """Backward Euler on the current, then symplectic Euler on the mechanics."""
+    qp, qp_d, qr, qr_d, curr = x
+    curr = (curr + dt / c.L * (Vin - c.ke * qr_d)) / (1 + dt * c.R / c.L)
+    Tm = c.kt * curr
+    qr_d = qr_d + dt * (Tm - c.B * qr_d) / c.J
+    qr = qr + dt * qr_d
+    qp_d = qp_d + dt * (c.grav * math.sin(qp) - Tm + Tp - c.dp * qp_d) / c.inertia
+    qp = qp + dt * qp_d
+    return (qp, qp_d, qr, qr_d, curr)
+
+
+def rk4_step(c, x, Vin, Tp, dt):
+    """Classic fourth-order Runge-Kutta on the full model."""
+    k1 = rwip_rhs(c, x, Vin, Tp)
+    k2 = rwip_rhs(c, [a + 0.5 * dt * b for a, b in zip(x, k1)], Vin, Tp)
+    k3 = rwip_rhs(c, [a + 0.5 * dt * b for a, b in zip(x, k2)], Vin, Tp)
+    k4 = rwip_rhs(c, [a + dt * b for a, b in zip(x, k3)], Vin, Tp)
+    return tuple(a + dt / 6 * (b1 + 2 * b2 + 2 * b3 + b4) for a, b1, b2, b3, b4 in zip(x, k1, k2, k3, k4))
+
+
+def exponential_step(c, x, Vin, Tp, dt):
+    """Exact electrical pole (qr_d frozen over the step), RK4 on the mechanics.
+
+    The mechanics see the mean motor torque over the step, so the step size
+    is independent of L/R.
+    """
+    qp, qp_d, qr, qr_d, curr = x
+    tau = c.L / c.R
+    decay = math.exp(-dt / tau)
+    curr_inf = (Vin - c.ke * qr_d) / c.R
+    curr_new = curr_inf + (curr - curr_inf) * decay
+    Tm = c.kt * (curr_inf + (curr - curr_inf) * (1 - decay) * tau / dt)
+
+    def mech(y):
+        return (y[1], (c.grav * math.sin(y[0]) - Tm + Tp - c.dp * y[1]) / c.inertia,
+                y[3], (Tm - c.B * y[3]) / c.J)
+
+    y = (qp, qp_d, qr, qr_d)
+    k1 = mech(y)
+    k2 = mech([a + 0.5 * dt * b for a, b in zip(y, k1)])
+    k3 = mech([a + 0.5 * dt * b for a, b in zip(y, k2)])
+    k4 = mech([a + dt * b for a, b in zip(y, k3)])
+    y = tuple(a + dt / 6 * (b1 + 2 * b2 + 2 * b3 + b4) for a, b1, b2, b3, b4 in zip(y, k1, k2, k3, k4))
+    return y + (curr_new,)
+
+
+STEPPERS = {
+    "semi-implicit": semi_implicit_step,
+    "rk4": rk4_step,
+    "exponential": exponential_step,
+}
+
+
+def make_stepper(params, method="euler"):
+    """Return ``step(state, Vin, Tp, dt) -> RwipState`` for a fixed-step method."""
+    if method == "euler":
+        return lambda state, Vin, Tp, dt: step(params, state, Vin, Tp, dt)
+    if method not in STEPPERS:
+        raise ValueError(f"Unknown fixed-step integrator {method!r}, expected 'euler' or one of {FIXED_STEP}")
+    c = model_constants(params)
+    stepper = STEPPERS[method]
+
+    def state_step(state, Vin, Tp, dt):
+        x = stepper(c, (state.qp, state.qp_d, state.qr, state.qr_d, state.curr_prev), Vin, Tp, dt)
+        return RwipState(x[0], x[1], x[2], x[3], x[4], (x[4] - state.curr_prev) / dt, c.kt * x[4])
+
+    return state_step
+
+
+# ==========================================================================================
+# ====================================== SIMULATE ==========================================
+# ==========================================================================================
+def simulate_ode(params, controller=None, t_end=10.0, dt=1e-3, method="rk4", disturbance=None, x0=None,
+                 dense_output=False, **options):
+    """rwip.simulate() with one of the continuous-model integrators.
+
+    For the adaptive methods the solver runs between controller samples with
+    its own step size; options (rtol, atol, ...) are passed to solve_ivp and,
+    with dense_output=True, out["sol"] is an OdeSolution over [0, t_end] that
+    evaluates (qp, qp_d, qr, qr_d, curr) at any time.
+    """
+    if method not in FIXED_STEP + ADAPTIVE:
+        raise ValueError(f"Unknown integrator {method!r}, expected one of {METHODS}")
+    from scipy.integrate import OdeSolution, solve_ivp  # only here, it is slow to import
+
+    p = params
+    c = model_constants(p)
+    if controller is None:
+        controller = HybridController(p)
+    if x0 is None:
+        x0 = RwipState.from_params(p)
+    elif not isinstance(x0, RwipState):
+        x0 = RwipState(*x0)
+    x = (float(x0.qp), float(x0.qp_d), float(x0.qr), float(x0.qr_d), float(x0.curr_prev))
+
+    n = int(round(t_end / dt))
+    rows = np.empty((n, len(COLUMNS)))
+    modes = np.full(n, -1, dtype=np.int8)
+    mode_index = {name: i for i, name in enumerate(MODES)}
+    limit = 24.0 if p.MotorLimit else math.inf
+    stepper = STEPPERS.get(method)
+    ts, interpolants = [0.0], []
+
+    Tp = 0.0
+    for k in range(n):
+        t = k * dt
+        Vin = min(max(controller(x[0], x[1], x[2], x[3]), -limit), limit)
+        if disturbance is not None:
+            Tp = disturbance(t)
+
+        if stepper is not None:
+            x = stepper(c, x, Vin, Tp, dt)
+        else:
+            sol = solve_ivp(lambda t, y: rwip_rhs(c, y, Vin, Tp), (t, t + dt), x, method=method,
+                            dense_output=dense_output, **options)
+            x = tuple(sol.y[:, -1])
+            if dense_output:
+                ts.extend(sol.sol.ts[1:])
+                interpolants.extend(sol.sol.interpolants)
+
+        rows[k] = (t + dt, x[0], x[1], x[2], x[3], c.kt * x[4], Vin, Tp, getattr(controller, "setpoint", 0.0))
+        modes[k] = mode_index.get(getattr(controller, "mode", None), -1)
+
+    out = {name: rows[:, i].copy() for i, name in enumerate(COLUMNS)}
+    out["mode"] = modes
+    if dense_output and interpolants:
+        out["sol"] = OdeSolution(np.array(ts), interpolants)
+    return out
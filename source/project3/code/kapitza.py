@@ -0,0 +1,67 @@
+"""
+Kapitza pendulum - flow of the vertically driven pendulum in codeNolte.py
+
+The vertically driven pendulum of codeNolte.py as functions of its drive
+amplitude F, damping delt and drive frequency w, in the dimensionless
+units of the script (time in units of 1/w0):
+
+    x'' = -(1 + F cos z) sin x - delt x',   z' = w
+
+State (x, v, z): angle from hanging down, angular velocity, drive phase.
+
+flow_batch is the same right-hand side for an (N, 3) batch of states, with
+F, delt and w scalars or (N,) arrays (batch_ode.py). variational_batch adds
+the tangent vector (dx, dv) and the two MEGNO integrals (lyapunov.py).
+
+Usage:
+    from scipy.integrate import odeint
+    from kapitza import DEFAULT_Y0, flow_deriv
+
+    x_t = odeint(flow_deriv, DEFAULT_Y0, t, args=(133.5, 0.0, 20.0))
+
+"""
+
+import numpy as np
+
+DEFAULT_Y0 = (np.pi + 0.3, 0.0, 0.0)  # Start of codeNolte.py, 0.3 rad from inverted
+
+
+def flow_deriv(x_y_z, t, F, delt, w):
+    """Right-hand side in odeint's argument order."""
+    x, y, z = x_y_z
+    return [y, -(1 + F * np.cos(z)) * np.sin(x) - delt * y, w]
+
+
+def flow_batch(t, y, F, delt, w):
+    """Right-hand side (N, 3) of a batch of states y (N, 3)."""
+    x, v, z = y[:, 0], y[:, 1], y[:, 2]
+    dy = np.empty_like(y)
+    dy[:, 0] = v
+    dy[:, 1] = -(1 + F * np.cos(z)) * np.sin(x) - delt * v
+    dy[:, 2] = w
+    return dy
+
+
+def variational_batch(t, y, F, delt, w):
+    """Flow plus linearized flow for a batch y (N, 7) of (x, v, z, dx, dv, m1, m2).
+
+    The tangent vector has no z component: z is the drive phase, the same
+    on every neighbouring trajectory. m1' = t (d . d')/|d|^2 and
+    m2' = 2 m1 / t, so that m2 / t is the mean MEGNO (Cincotta & Simo).
+    """
+    x, v, z, dx, dv = y[:, 0], y[:, 1], y[:, 2], y[:, 3], y[:, 4]
+    drive = 1 + F * np.cos(z)
+    dy = np.empty_like(y)
+    dy[:, 0] = v
+    dy[:, 1] = -drive * np.sin(x) - delt * v
+    dy[:, 2] = w
+    dy[:, 3] = dv
+    dy[:, 4] = -drive * np.cos(x) * dx - delt * dv
+    dy[:, 5] = t * (dx * dy[:, 3] + dv * dy[:, 4]) / (dx * dx + dv * dv)
+    dy[:, 6] = 2 * y[:, 5] / t if t > 0 else 0.0
+    return dy
+
+
+def period(w):
+    """Drive period T = 2 pi / w."""
+    return 2 * np.pi / w
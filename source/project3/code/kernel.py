@@ -0,0 +1,181 @@
+"""
+Reaction Wheel Inverted Pendulum - compiled kernel
+
+Fuses the hybrid controller, the motor electrical model and the pendulum
+integration into one loop over many steps. When numba is installed the loop
+is compiled and runs in parallel over the pendulums; otherwise
+simulate_compiled() falls back to the NumPy ensemble of ensemble.py, with the
+same results.
+
+Usage:
+    import numpy as np
+    import param
+    from rwip import make_params
+    from kernel import simulate_compiled
+
+    p = make_params(param, init_qp=np.linspace(150, 210, 1000))
+    state = simulate_compiled(p, t_end=60.0, dt=1e-4)
+
+"""
+
+import math
+
+import numpy as np
+
+from rwip import MODES
+from ensemble import BANG_BANG, BRAKE, EnsembleState, ensemble_gains, ensemble_size, simulate_ensemble
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    prange = range
+    HAVE_NUMBA = False
+
+LQR, PID = MODES.index("LQR"), MODES.index("PID")
+
+# Columns of the packed constant table, one row per pendulum
+CONSTANTS = ("ke", "kt", "R", "L", "B", "J", "grav", "inertia", "dp",
+             "kinetic", "potential", "reqE", "bound", "Kp", "limit", "K0", "K1")
+
+# Columns of the packed state table, one row per pendulum
+STATE = ("qp", "qp_d", "qr", "qr_d", "curr_prev", "curr_d", "Tm", "Vin", "setpoint")
+
+
+def pack_constants(params, n, K=None):
+    """Constant table (N, len(CONSTANTS)) for the kernel."""
+    p = params
+    if K is None:
+        K = np.zeros((n, 4))
+    K = np.broadcast_to(K, (n, 4))
+    columns = {
+        "ke": p.ke, "kt": p.kt, "R": p.R, "L": p.L, "B": p.B, "J": p.J,
+        "grav": (p.m1 * p.L1 + p.m2 * p.L2) * p.g,
+        "inertia": (p.m1 * p.L1**2.0) + (p.m2 * p.L2) + p.I1,
+        "dp": p.dp,
+        "kinetic": 0.5 * (p.m1 * p.L1**2 + p.m2 * p.L2**2 + p.J + p.I1),
+        "potential": (p.m1 + p.m2) * p.g * p.L2,
+        "reqE": (p.m1 + p.m2) * p.g * p.L2,
+        "bound": np.deg2rad(p.StabilizeBound),
+        "Kp": p.Kp,
+        "limit": np.where(np.asarray(p.MotorLimit, dtype=bool), 24.0, np.inf),  # MotorLimit may be per pendulum
+        "K0": K[:, 0], "K1": K[:, 1],
+    }
+    return np.column_stack([np.broadcast_to(np.asarray(columns[name], dtype=np.float64), (n,)) for name in CONSTANTS])
+
+
+def _run(x, mode, settled, wait, c, Tp, stab_mode, n_steps, dt, metrics, tol):
+    """Advance every row of x by n_steps; plain Python so numba can compile it.
+
+    metrics (N, 2) accumulates the energy |qr_d * Tm| dt and holds the last
+    time (from the start of the call) |qp - setpoint| was at least tol.
+    """
+    two_pi = 2 * math.pi
+    for i in prange(x.shape[0]):
+        qp, qp_d, qr, qr_d = x[i, 0], x[i, 1], x[i, 2], x[i, 3]
+        curr_prev, curr_d, Tm, Vin, setpoint = x[i, 4], x[i, 5], x[i, 6], x[i, 7], x[i, 8]
+        m, s_flag, w_flag = mode[i], settled[i], wait[i]
+        ke, kt, R, L, B, J = c[i, 0], c[i, 1], c[i, 2], c[i, 3], c[i, 4], c[i, 5]
+        grav, inertia, dp, kinetic, potential = c[i, 6], c[i, 7], c[i, 8], c[i, 9], c[i, 10]
+        reqE, bound, Kp, limit, K0, K1 = c[i, 11], c[i, 12], c[i, 13], c[i, 14], c[i, 15], c[i, 16]
+        tp = Tp[i]
+        energy, last_outside = metrics[i, 0], metrics[i, 1]
+        for k in range(n_steps):
+            # Controller
+            offset = (qp - math.pi) / two_pi
+            if offset < 0:
+                setpoint = (math.floor(offset) + 1) * two_pi
+            elif offset > 0:
+                setpoint = math.ceil(offset) * two_pi
+            E = kinetic * qp_d * qp_d + potential * math.cos(qp)
+            wrapped = abs(qp) % two_pi
+            if w_flag:
+                m = BRAKE
+                if abs(E) < 0.05:
+                    w_flag = False
+            elif wrapped <= bound or wrapped >= two_pi - bound:
+                s_flag = True
+                m = stab_mode
+            else:
+                if s_flag:
+                    w_flag = True
+                    s_flag = False
+                if not w_flag:
+                    m = BANG_BANG
+            if m == LQR:
+                Vin = (setpoint - qp) * K0 - qp_d * K1
+            elif m == PID:
+                Vin = -(setpoint - qp) * Kp
+            elif m == BANG_BANG:
+                Vin = 12.0 if (qp_d < 0) == (E < reqE) else -12.0
+            else:
+                Vin = -12.0 if qp_d < 0 else 12.0
+            if Vin > limit:
+                Vin = limit
+            elif Vin < -limit:
+                Vin = -limit
+
+            # Motor
+            curr = (Vin - (qr_d * ke) - (L * curr_d)) / R
+            curr_d = (curr - curr_prev) / dt
+            Tm = curr * kt
+            qr_d = qr_d + ((Tm - B * qr_d) / J) * dt
+            qr = qr + (qr_d * dt)
+            curr_prev = curr
+
+            # Pendulum
+            qp_d = qp_d + ((grav * math.sin(qp) - Tm + tp - dp * qp_d) / inertia) * dt
+            qp = qp + (qp_d * dt)
+
+            energy += abs(qr_d * Tm) * dt
+            if abs(qp - setpoint) >= tol:
+                last_outside = (k + 1) * dt
+
+        metrics[i, 0], metrics[i, 1] = energy, last_outside
+        x[i, 0], x[i, 1], x[i, 2], x[i, 3] = qp, qp_d, qr, qr_d
+        x[i, 4], x[i, 5], x[i, 6], x[i, 7], x[i, 8] = curr_prev, curr_d, Tm, Vin, setpoint
+        mode[i], settled[i], wait[i] = m, s_flag, w_flag
+
+
+if HAVE_NUMBA:
+    _run = njit(parallel=True, cache=True)(_run)
+
+
+def simulate_compiled(params, t_end=10.0, dt=1e-3, state=None, disturbance=None, K=None, stabilizer=None,
+                      metrics=None, tol_deg=0.1):
+    """Same as ensemble.simulate_ensemble, through the compiled kernel when numba is available.
+
+    The kernel only takes a constant disturbance torque (scalar or array of
+    length N); a callable disturbance always runs on the NumPy ensemble.
+    metrics is an optional (N, 2) float array the kernel fills with the
+    energy and last time outside tol_deg of the setpoint (see _run); it is
+    left untouched on the NumPy fallback.
+    """
+    if not HAVE_NUMBA or callable(disturbance):
+        return simulate_ensemble(params, t_end, dt, state, disturbance, K, stabilizer)
+
+    n = ensemble_size(params)
+    if state is None:
+        state = EnsembleState.from_params(params, n)
+    n = len(state)
+    stabilizer = stabilizer or params.Stabilize_Controller
+    if K is None and stabilizer == "LQR":
+        K = ensemble_gains(params, n)
+
+    x = np.column_stack([np.broadcast_to(getattr(state, name), (n,)) for name in STATE]).astype(np.float64)
+    mode = state.mode.astype(np.int8)
+    settled = state.settled_flag.copy()
+    wait = state.wait_flag.copy()
+    Tp = np.ascontiguousarray(np.broadcast_to(np.asarray(0.0 if disturbance is None else disturbance, dtype=np.float64), (n,)))
+    c = pack_constants(params, n, K)
+
+    if metrics is None:
+        metrics, tol = np.zeros((n, 2)), math.inf
+    else:
+        tol = math.radians(tol_deg)
+    _run(x, mode, settled, wait, c, Tp, MODES.index(stabilizer), int(round(t_end / dt)), dt, metrics, tol)
+
+    for i, name in enumerate(STATE):
+        setattr(state, name, x[:, i].copy())
+    state.mode, state.settled_flag, state.wait_flag = mode, settled, wait
+    return state
@@ -0,0 +1,147 @@
+"""
+Reaction Wheel Inverted Pendulum - live plot
+
+Persistent version of the simulator's plot window: the subplots, twin axis
+and Line2D objects are created once, the samples added to the telemetry
+buffer since the last update are appended to the plot's own arrays, and the
+lines are redrawn with blitting over a cached background at a capped rate.
+A full redraw only happens when the axes have to be rescaled.
+
+Usage:
+    fig = plt.figure(figsize=(5, 5))
+    live = LivePlot(fig, max_fps=20)
+    ...
+    live.update(data)  # data: telemetry.RingBuffer with timedt, qp, setpoint, Tm, qr_d
+
+"""
+
+import time
+
+import numpy as np
+
+# Telemetry columns shown, time first
+COLUMNS = ("timedt", "qp", "setpoint", "qr_d", "Tm")
+
+
+class LivePlot:
+    """qp/setpoint and qr_d/Tm over time, updated with blitting."""
+
+    def __init__(self, fig, max_fps=20):
+        self.fig = fig
+        self.canvas = fig.canvas
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self._last_draw = 0.0
+        self._last_total = -1
+        self._background = None
+        self._samples = None  # (len(COLUMNS), 2 capacity), shown samples in [_start, _end)
+        self._start = self._end = 0
+
+        fig.clf()
+        self.ax1 = fig.add_subplot(2, 1, 1)
+        self.ax2 = fig.add_subplot(2, 1, 2)
+        self.ax3 = self.ax2.twinx()
+
+        self.lines = {
+            "qp": self.ax1.plot([], [], label="qp", color="blue", linewidth=2, animated=True)[0],
+            "setpoint": self.ax1.plot([], [], label="setpoint", color="red", linewidth=2, animated=True)[0],
+            "qr_d": self.ax2.plot([], [], label="qr_d", color="purple", linewidth=2, animated=True)[0],
+            "Tm": self.ax3.plot([], [], label="Tm", color="green", linewidth=2, animated=True)[0],
+        }
+        self.ax1.legend()
+        self.ax2.legend(loc="upper left")
+        self.ax3.legend(loc="upper right")
+        self.ax3.set_ylim(-1, 1)
+
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        self.reset()
+
+    def reset(self):
+        """Back to the initial axis limits, e.g. after the simulation is reset."""
+        for ax in (self.ax1, self.ax2):
+            ax.set_xlim(0, 1)
+            ax.set_ylim(-1, 1)
+        for line in self.lines.values():
+            line.set_data([], [])
+        self._last_total = -1
+        self._start = self._end = 0
+        self.redraw()
+
+    def _on_draw(self, event):
+        # Every full draw (resize, rescale) refreshes the cached background
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for ax, names in ((self.ax1, ("qp", "setpoint")), (self.ax2, ("qr_d",)), (self.ax3, ("Tm",))):
+            for name in names:
+                ax.draw_artist(self.lines[name])
+
+    def redraw(self):
+        """Full redraw of the figure, axes included."""
+        self.canvas.draw()
+
+    def _rescale(self, t, data):
+        """Grow the axis limits to fit the data; True when they changed."""
+        changed = False
+        x0, x1 = self.ax1.get_xlim()
+        if len(t) and (t[-1] > x1 or t[0] < x0):
+            span = max(t[-1] - t[0], 1.0)
+            for ax in (self.ax1, self.ax2):
+                ax.set_xlim(t[0], t[0] + 1.5 * span)
+            changed = True
+        for ax, names in ((self.ax1, ("qp", "setpoint")), (self.ax2, ("qr_d",))):
+            values = [data[name] for name in names if len(data[name])]
+            if not values:
+                continue
+            lo = min(v.min() for v in values)
+            hi = max(v.max() for v in values)
+            y0, y1 = ax.get_ylim()
+            if lo < y0 or hi > y1:
+                margin = 0.25 * max(hi - lo, 1.0)
+                ax.set_ylim(min(lo, y0) - margin, max(hi, y1) + margin)
+                changed = True
+        return changed
+
+    def _append(self, data):
+        """Copy the samples added to data since the last update; the shown columns."""
+        if self._samples is None or self._samples.shape[1] != 2 * data.capacity:
+            self._samples = np.empty((len(COLUMNS), 2 * data.capacity))
+            self._start = self._end = 0
+        if self._last_total < 0 or data.total < self._last_total:  # first update or data cleared
+            self._start = self._end = 0
+            shown = 0
+        else:
+            shown = self._last_total
+        new = min(data.total - shown, data.capacity)
+        if new:
+            keep = min(self._end - self._start, data.capacity - new)  # at most capacity samples are shown
+            if self._end + new > self._samples.shape[1]:  # out of room: move the kept samples to the front
+                self._samples[:, :keep] = self._samples[:, self._end - keep:self._end]
+                self._end = keep
+            for i, name in enumerate(COLUMNS):
+                self._samples[i, self._end:self._end + new] = data.tail(name, new)
+            self._end += new
+            self._start = self._end - keep - new
+        return {name: self._samples[i, self._start:self._end] for i, name in enumerate(COLUMNS)}
+
+    def update(self, data, force=False):
+        """Show new samples of data; skipped when nothing is new or too soon, unless forced."""
+        now = time.perf_counter()
+        if not force and (data.total == self._last_total or now - self._last_draw < self.min_interval):
+            return False
+        columns = self._append(data)
+        self._last_total = data.total
+        self._last_draw = now
+
+        t = columns["timedt"]
+        for name, line in self.lines.items():
+            line.set_data(t, columns[name])
+
+        rescaled = self._rescale(t, columns)
+        if force or rescaled or self._background is None:
+            self.redraw()
+        else:
+            self.canvas.restore_region(self._background)
+            self._draw_lines()
+            self.canvas.blit(self.fig.bbox)
+        return True
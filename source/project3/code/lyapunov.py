@@ -0,0 +1,126 @@
+"""
+Chaos indicators - Lyapunov exponent, FLI and MEGNO of the Kapitza pendulum
+
+Largest Lyapunov exponent, FLI and MEGNO of the Kapitza pendulum
+(kapitza.py) over a grid of drive amplitude F, drive frequency w and
+damping delt. The trajectory and its tangent vector are integrated
+together (kapitza.variational_batch) for a whole batch of parameter
+points at once (batch_ode.solve_batch); the tangent vector is renormalized
+every `renorm` time units and its log growth accumulated.
+
+    lyapunov   log growth / t_end, tends to 0 for regular orbits
+    fli        largest log |tangent| reached (fast Lyapunov indicator)
+    megno      mean MEGNO at t_end, 2 for quasi-periodic orbits, 0 for
+               stable periodic ones, growing like lyapunov t / 2 for chaos
+
+indicator_map() splits the grid into batches across a process pool and keeps
+each point in a cache.ResultCache, so repeated or refined maps only
+integrate new points.
+
+Usage:
+    import numpy as np
+    from cache import cache_path
+    from lyapunov import chaos_indicators, indicator_map
+
+    out = chaos_indicators(F=133.5, w=20.0, delt=0.0, t_end=200.0)
+    out = indicator_map(F=np.linspace(30, 140, 100), w=20.0, delt=[0.0, 0.01], cache=cache_path("lyapunov.npz"))
+    out["F"], out["lyapunov"], out["megno"], ...
+
+    python lyapunov.py      # MEGNO map over (F, w)
+
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch_ode import solve_batch
+from cache import ResultCache, cache_path, result_key
+from kapitza import DEFAULT_Y0, variational_batch
+
+INDICATORS = ("lyapunov", "fli", "megno")
+
+
+def chaos_indicators(F, w, delt, t_end=100.0, y0=DEFAULT_Y0, renorm=1.0, rtol=1e-8, atol=1e-10):
+    """Indicators (dict of (N,) arrays) for parameter points F, w, delt (scalars or (N,) arrays)."""
+    F, w, delt = (np.asarray(a, dtype=float) for a in np.broadcast_arrays(np.atleast_1d(F), w, delt))
+    n = len(F)
+    y = np.zeros((n, 7))
+    y[:, :3] = y0
+    y[:, 3] = 1.0  # Tangent vector along the angle
+
+    log_growth = np.zeros(n)
+    fli = np.zeros(n)
+    times = np.linspace(0.0, t_end, max(1, int(np.ceil(t_end / renorm))) + 1)
+    for t0, t1 in zip(times[:-1], times[1:]):
+        y = solve_batch(variational_batch, y, (t0, t1), args=(F, delt, w), rtol=rtol, atol=atol)[-1]
+        norm = np.hypot(y[:, 3], y[:, 4])
+        log_growth += np.log(norm)
+        np.maximum(fli, log_growth, out=fli)
+        y[:, 3:5] /= norm[:, None]
+    return {"lyapunov": log_growth / t_end, "fli": fli, "megno": y[:, 6] / t_end}
+
+
+def _indicators(job):
+    F, w, delt, options = job
+    out = chaos_indicators(F, w, delt, **options)
+    return np.column_stack([out[name] for name in INDICATORS])
+
+
+def indicator_map(F, w=20.0, delt=0.0, t_end=100.0, y0=DEFAULT_Y0, renorm=1.0, rtol=1e-8, atol=1e-10,
+                  workers=None, batch_size=256, cache=None):
+    """Indicators for all combinations of F, w and delt (scalars or 1-D arrays).
+
+    Returns a dict with "F", "w", "delt" and the INDICATORS as (M,) arrays,
+    F varying slowest. Points missing from the cache (a ResultCache, a path
+    for one, or None) are integrated in batches of batch_size on `workers`
+    processes.
+    """
+    grids = np.meshgrid(np.atleast_1d(F), np.atleast_1d(w), np.atleast_1d(delt), indexing="ij")
+    F_grid, w_grid, delt_grid = (g.ravel().astype(float) for g in grids)
+    if not isinstance(cache, ResultCache):
+        cache = ResultCache(cache)
+    options = {"t_end": t_end, "y0": tuple(float(v) for v in y0), "renorm": renorm, "rtol": rtol, "atol": atol}
+    keys = [result_key(F=f, w=ww, delt=d, **options) for f, ww, d in zip(F_grid, w_grid, delt_grid)]
+
+    missing = cache.missing(keys)
+    if missing:
+        first = {}
+        for i, key in enumerate(keys):
+            first.setdefault(key, i)
+        index = np.array([first[key] for key in missing])
+        batches = [index[i:i + batch_size] for i in range(0, len(index), batch_size)]
+        jobs = [(F_grid[b], w_grid[b], delt_grid[b], options) for b in batches]
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(jobs) <= 1:
+            results = [_indicators(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_indicators, jobs))
+        for b, rows in zip(batches, results):
+            for i, row in zip(b, rows):
+                cache[keys[i]] = row
+        cache.save()
+
+    rows = np.array([cache[key] for key in keys]).reshape(len(keys), len(INDICATORS))
+    out = {"F": F_grid, "w": w_grid, "delt": delt_grid}
+    out.update({name: rows[:, i] for i, name in enumerate(INDICATORS)})
+    return out
+
+
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
+    F_values, w_values = np.linspace(0, 200, 60), np.linspace(5, 40, 60)
+    start = time.perf_counter()
+    out = indicator_map(F_values, w_values, 0.0, t_end=50.0, cache=cache_path("lyapunov.npz"))
+    print(f"{len(out['F'])} points in {time.perf_counter() - start:.1f} s")
+    plt.pcolormesh(w_values, F_values, np.clip(out["megno"], 0, 8).reshape(len(F_values), len(w_values)),
+                   shading="auto")
+    plt.colorbar(label="MEGNO")
+    plt.xlabel("w")
+    plt.ylabel("F")
+    plt.title("Chaos indicator of the Kapitza pendulum")
+    plt.show()
@@ -12,6 +12,8 @@ Date: [11 Dec 2023]
 
 import numpy as np
 
+import cache
+
 # Reaction Wheel Inverted Pendulum parameters
 L1 = 0.11  # Length of Pendulum from origin to center of mass (m)
 L2 = 0.18  # Length of Pendulum (m)
@@ -35,6 +37,31 @@ B = 3.85e-3  # Damping of DC Motor (Nn/v)
 # Sound 
 Sound = False # Flag to enable/disable sound
 
+# Simulation loop
+PhysicsRate = 10000  # Physics steps per simulated second (Hz)
+RenderRate = 60  # Frames drawn per second (Hz)
+SimulationSpeed = 1.0  # Simulated seconds per wall-clock second, > 1 runs faster than real time
+Integrator = "exponential"  # "euler" (original model, unstable below dt = L/R), "semi-implicit", "rk4" or "exponential"
+PublishRate = 500  # States per second the physics process sends to the GUI process (Hz)
+SharedRingCapacity = 4096  # States kept in the shared ring between the two processes
+
+# Telemetry (samples kept for the plot window)
+TelemetryCapacity = 20000  # Samples kept in memory, oldest are dropped first
+TelemetryDecimation = 1  # Keep every n-th frame
+TelemetrySpillDir = None  # Directory to write the full history to, e.g. "telemetry"
+LivePlotFPS = 20  # Maximum redraw rate of the live plot window (Hz)
+
+# Record/replay
+RecordFile = None  # Session log of injections and resets for replay.py, e.g. "session.rwlog"
+
+# Trajectory export
+ExportFile = None  # Every physics step to a columnar file, e.g. "trajectory.parquet", ".arrow" or ".h5"
+
+# Profiling
+Profile = False  # Per-stage timers of the simulator loops, shown in an overlay (toggle with F3)
+ProfileWindow = 1000  # Samples per stage the rolling percentiles are taken over
+ProfileTrace = None  # Chrome trace JSON written on exit, e.g. "trace.json" (implies Profile)
+
 # Motor Limit
 MotorLimit = True # Set to False if you don't serious about hardware Limitation
 
@@ -68,4 +95,6 @@ N_LQR = np.array([[0],  # No cross-coupling terms for LQR
                   [0],
                   [0]])
 
+GainCacheFile = cache.cache_path("lqr_gains.npz")  # File the synthesized LQR gains are kept in between runs (None keeps them in memory)
+
 StabilizeBound = 25  # Angle at which LQR starts to stabilize (degree)
@@ -0,0 +1,121 @@
+"""
+Poincare sections - first-return maps of driven pendulum trajectories
+
+First-return maps of sampled or integrated trajectories, for codeNolte.py
+and the driven pendulum tools.
+
+    section         crossings of a sampled section function s (sign-change
+                    masks, linear interpolation of the state between samples)
+    time_section    stroboscopic section t = (k + phase) T of a sampled trajectory
+    strobe          state at exactly t = (k + phase) T, the only output times
+                    asked from odeint, so no fine sampling grid is stored
+    event_section   crossings located by the solver (solve_ivp events), so the
+                    points lie on any section g(t, y) = 0 up to the solver
+                    tolerance without dense output
+    phase_event     event function for a periodic state variable, e.g. the
+                    drive phase z = w t of an autonomous flow
+
+Every function returns arrays sized by the number of crossings found.
+
+Usage:
+    from poincare import event_section, phase_event, time_section
+
+    tk, pts = time_section(t, x_t, T)                      # sampled odeint output
+    tk, pts = strobe(flow_deriv, y0, T, 10000, skip=100)   # section times only
+    tk, pts = event_section(lambda t, y: flow_deriv(y, t), y0, 2000.0,
+                            phase_event(2, 2 * np.pi, np.pi))
+
+"""
+
+import numpy as np
+
+
+def crossings(s, direction=1):
+    """Indices k and fractions f where s crosses zero between samples k and k + 1.
+
+    direction 1 counts - to +, -1 + to -, 0 both. s must be continuous
+    between samples (a wrapped phase jumps and must use direction != 0).
+    """
+    s = np.asarray(s, dtype=float)
+    before, after = s[:-1], s[1:]
+    if direction > 0:
+        mask = (before < 0) & (after >= 0)
+    elif direction < 0:
+        mask = (before > 0) & (after <= 0)
+    else:
+        mask = ((before < 0) & (after >= 0)) | ((before > 0) & (after <= 0))
+    k = np.flatnonzero(mask)
+    f = before[k] / (before[k] - after[k])
+    return k, f
+
+
+def interpolate(y, k, f):
+    """Samples of y (N, ...) linearly interpolated at positions k + f."""
+    y = np.asarray(y)
+    f = f.reshape((-1,) + (1,) * (y.ndim - 1))
+    return y[k] + (y[k + 1] - y[k]) * f
+
+
+def section(s, t, y, direction=1):
+    """Times (M,) and states (M, ...) where the section function s crosses zero."""
+    k, f = crossings(s, direction)
+    return interpolate(t, k, f), interpolate(y, k, f)
+
+
+def time_section(t, y, period, phase=0.5):
+    """Stroboscopic section of a sampled trajectory at t = (k + phase) period."""
+    t = np.asarray(t, dtype=float)
+    s = np.mod(t - (phase - 0.5) * period, period) - 0.5 * period  # rises through 0 at the section, jumps back half way
+    return section(s, t, y, direction=1)
+
+
+def phase_event(index, period=2 * np.pi, phase=0.0):
+    """solve_ivp event, zero once per period where y[index] = phase (mod period).
+
+    sin(pi (y - phase) / period) changes sign at every section and nowhere
+    else, so it is used with direction 0.
+    """
+    def event(t, y):
+        return np.sin(np.pi * (y[index] - phase) / period)
+
+    event.direction = 0
+    return event
+
+
+def time_event(period, phase=0.0):
+    """solve_ivp event, zero at t = (k + phase) period, for non-autonomous flows."""
+    def event(t, y):
+        return np.sin(np.pi * (t / period - phase))
+
+    event.direction = 0
+    return event
+
+
+def strobe(fun, y0, period, n, phase=0.5, skip=0, **options):
+    """States (n, len(y0)) of odeint's fun(y, t) at t = (k + phase) period, k = skip .. skip + n - 1.
+
+    options (rtol, atol, hmax, ...) go to odeint.
+    """
+    from scipy.integrate import odeint  # only here, it is slow to import
+
+    tk = (np.arange(skip + n) + phase) * period  # every period, so each odeint call stays short
+    y = odeint(fun, np.asarray(y0, dtype=float), np.concatenate(([0.0], tk)), **options)
+    return tk[skip:], y[1 + skip:]
+
+
+def event_section(fun, y0, t_end, event, t0=0.0, skip=0, method="DOP853", **options):
+    """Integrate fun(t, y) from y0 and return the times (M,) and states (M, n) where event(t, y) = 0.
+
+    The solver locates each crossing by root finding on its step
+    interpolant; no trajectory is stored. The first `skip` crossings
+    (transient) are dropped. options (rtol, atol, max_step, ...) go to solve_ivp.
+    """
+    from scipy.integrate import solve_ivp  # only here, it is slow to import
+
+    options.setdefault("rtol", 1e-9)
+    options.setdefault("atol", 1e-9)
+    sol = solve_ivp(fun, (t0, t_end), np.asarray(y0, dtype=float), method=method, events=event,
+                    t_eval=[], **options)
+    if not sol.success:
+        raise RuntimeError(f"solve_ivp failed: {sol.message}")
+    return sol.t_events[0][skip:], sol.y_events[0][skip:]
@@ -0,0 +1,141 @@
+"""
+Reaction Wheel Inverted Pendulum - stage profiler
+
+Named timers for the stages of the simulator loops (event polling,
+controller, physics, drawing, window move, display flip, ...). Each stage
+keeps its last `window` durations in a ring, from which rolling percentiles
+are computed on demand; timing a stage costs two perf_counter() calls and a
+store. With trace_events > 0 the last spans are also kept for a Chrome trace
+(chrome://tracing or https://ui.perfetto.dev). A disabled profiler hands out
+a shared no-op stage, so the instrumented loops cost next to nothing when
+profiling is off.
+
+Usage:
+    from profiling import Profiler, write_trace
+
+    prof = Profiler(window=1000, trace_events=100000)
+    with prof.stage("draw"):
+        ...
+    prof.add("physics", duration)        # time measured elsewhere
+    prof.summary()                       # {stage: {"count", "mean", "p50", "p90", "p99", "max"}} in seconds
+    prof.report()                        # the same as text lines for the overlay
+    write_trace("trace.json", prof.trace_events())
+
+"""
+
+import json
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+PERCENTILES = (50, 90, 99)
+
+
+class _Stage:
+    """Context manager timing one stage."""
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.profiler.add(self.name, end - self.start, self.start)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Profiler:
+    """Rolling per-stage timings, optionally with a trace of the last spans."""
+
+    def __init__(self, window=1000, trace_events=0, enabled=True, name=None):
+        self.window = int(window)
+        self.enabled = enabled
+        self.name = name or f"pid {os.getpid()}"
+        self.pid = os.getpid()
+        self._samples = {}
+        self._counts = {}
+        self._trace = deque(maxlen=trace_events) if trace_events else None
+
+    def stage(self, name):
+        """Context manager timing the block as stage `name`."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def add(self, name, duration, start=None):
+        """One sample of `duration` seconds; with a start time it also goes to the trace."""
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = np.zeros(self.window)
+            self._counts[name] = 0
+        count = self._counts[name]
+        samples[count % self.window] = duration
+        self._counts[name] = count + 1
+        if self._trace is not None and start is not None:
+            self._trace.append((name, start, duration))
+
+    def reset(self):
+        self._samples.clear()
+        self._counts.clear()
+        if self._trace is not None:
+            self._trace.clear()
+
+    def stats(self, name):
+        """count, mean, percentiles and max (seconds) over the last `window` samples of a stage."""
+        count = self._counts[name]
+        samples = self._samples[name][:min(count, self.window)]
+        p = np.percentile(samples, PERCENTILES)
+        out = {"count": count, "mean": float(samples.mean())}
+        out.update({f"p{q}": float(v) for q, v in zip(PERCENTILES, p)})
+        out["max"] = float(samples.max())
+        return out
+
+    def summary(self):
+        """stats() of every stage, in the order the stages were first seen."""
+        return {name: self.stats(name) for name in self._samples}
+
+    def trace_events(self):
+        """The kept spans as Chrome trace events (complete events, times in microseconds)."""
+        events = [{"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": self.name}}]
+        for name, start, duration in self._trace or ():
+            events.append({"name": name, "ph": "X", "pid": self.pid, "tid": 0,
+                           "ts": start * 1e6, "dur": duration * 1e6})
+        return events
+
+    def report(self, summary=None, title=None):
+        """Text lines with the mean and percentiles of each stage in ms."""
+        summary = self.summary() if summary is None else summary
+        lines = [title or self.name]
+        lines += [f"{name:<12}{s['mean'] * 1e3:7.3f}{s['p50'] * 1e3:7.3f}{s['p90'] * 1e3:7.3f}{s['p99'] * 1e3:7.3f}"
+                  for name, s in summary.items()]
+        return lines
+
+
+REPORT_HEADER = f"{'stage [ms]':<12}{'mean':>7}{'p50':>7}{'p90':>7}{'p99':>7}"
+
+
+def write_trace(path, *event_lists):
+    """Write the events of one or more profilers to a Chrome trace JSON file."""
+    events = [event for events in event_lists for event in events]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,127 @@
+"""
+Reaction Wheel Inverted Pendulum - render cache
+
+Helpers that keep the per-frame cost of the pygame window low:
+
+    build_background  the static parts (panel, grid, buttons) drawn once
+    TextCache         rendered text surfaces keyed by string, plus per-glyph
+                      surfaces for the numbers that change every frame
+    DirtyRects        restores only the areas drawn in the previous frame and
+                      updates only the changed areas of the display
+    draw_lines        text lines from a TextCache, e.g. the profiler overlay
+
+"""
+
+from collections import OrderedDict
+
+import pygame
+
+WHITE = (255, 255, 255)
+GREY = (100, 100, 100)
+RED = (255, 0, 0)
+BLACK = (0, 0, 0)
+PANEL = (24, 24, 24)
+
+
+def build_background(width, height, font):
+    """Surface with everything that does not change between frames."""
+    background = pygame.Surface((width, height)).convert()
+    background.fill(WHITE)
+    pygame.draw.rect(background, PANEL, (0, 0, width + 1, 160))
+
+    # Grid
+    for i in range(0, width + 1, 50):
+        pygame.draw.line(background, GREY, (i, 160), (i, 600), 1)
+    for i in range(160, height, 50):
+        pygame.draw.line(background, GREY, (0, i), (width, i), 1)
+
+    # Buttons
+    pygame.draw.rect(background, GREY, (10, 10, 100, 50))
+    background.blit(font.render("INJECT", True, WHITE), (20, 23))
+    pygame.draw.rect(background, RED, (292, 10, 100, 50))
+    background.blit(font.render("RESET", True, WHITE), (303, 23))
+
+    # Disturbance input field
+    pygame.draw.rect(background, GREY, (110, 10, 130, 50))
+    pygame.draw.rect(background, WHITE, (125, 20, 100, 30))
+    return background
+
+
+class TextCache:
+    """Rendered text keyed by (string, color), least recently used dropped first."""
+
+    def __init__(self, font, max_size=256):
+        self.font = font
+        self.max_size = max_size
+        self._texts = OrderedDict()
+        self._glyphs = {}
+
+    def render(self, text, color):
+        key = (text, color)
+        surface = self._texts.get(key)
+        if surface is None:
+            surface = self.font.render(text, True, color)
+            self._texts[key] = surface
+            if len(self._texts) > self.max_size:
+                self._texts.popitem(last=False)
+        else:
+            self._texts.move_to_end(key)
+        return surface
+
+    def glyph(self, char, color):
+        key = (char, color)
+        surface = self._glyphs.get(key)
+        if surface is None:
+            surface = self._glyphs[key] = self.font.render(char, True, color)
+        return surface
+
+    def blit(self, screen, label, value, color, pos):
+        """Draw a cached label followed by a value built from cached glyphs; returns the dirty Rect."""
+        x, y = pos
+        rect = screen.blit(self.render(label, color), pos)
+        x = rect.right
+        for char in value:
+            glyph = self.glyph(char, color)
+            screen.blit(glyph, (x, y))
+            x += glyph.get_width()
+        rect.width = x - rect.x
+        return rect
+
+
+def draw_lines(screen, text_cache, lines, pos, color=BLACK, spacing=13):
+    """Draw lines of text top to bottom from pos; returns the dirty Rects."""
+    x, y = pos
+    return [screen.blit(text_cache.render(line, color), (x, y + i * spacing)) for i, line in enumerate(lines)]
+
+
+class DirtyRects:
+    """Restore and update only the parts of the screen drawn in the last two frames."""
+
+    def __init__(self, screen, background):
+        self.screen = screen
+        self.background = background
+        self._last = []
+        self._now = []
+        self._full = True
+
+    def invalidate(self):
+        """Redraw the whole screen on the next frame."""
+        self._full = True
+
+    def begin(self):
+        if self._full:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            for rect in self._last:
+                self.screen.blit(self.background, rect, rect)
+
+    def add(self, *rects):
+        self._now.extend(rects)
+
+    def flip(self):
+        if self._full:
+            pygame.display.flip()
+            self._full = False
+        else:
+            pygame.display.update(self._last + self._now)
+        self._last, self._now = self._now, []
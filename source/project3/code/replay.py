@@ -0,0 +1,167 @@
+"""
+Reaction Wheel Inverted Pendulum - session record/replay
+
+The simulator's physics runs at a fixed step, so an interactive session is
+fully determined by what the user did and at which physics step: disturbance
+injections (torque and the number of steps of the frame it acted over) and
+resets. EventLog writes these to a compact binary log; replay() reruns the
+session headless at full speed and regenerates the identical trajectory.
+
+File format (little endian):
+
+    header   8s magic b"RWIPLOG1", d physics rate (Hz), 16s integrator,
+             20s SHA-1 of the parameters
+    records  B kind, Q physics step, I duration (steps), d value
+             kind 1 = inject (value = Tp), 2 = reset, 3 = end of session
+
+Usage:
+    # simulator.py records when param.RecordFile is set
+    python replay.py session.rwlog
+
+    from replay import replay
+    out = replay("session.rwlog", param)     # columns of rwip.simulate() per physics step
+
+"""
+
+import hashlib
+import struct
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from integrators import make_stepper
+from rwip import COLUMNS, MODES, HybridController, RwipState
+
+MAGIC = b"RWIPLOG1"
+HEADER = struct.Struct("<8sd16s20s")
+RECORD = struct.Struct("<BQId")
+INJECT, RESET, END = 1, 2, 3
+
+# Display and file settings that do not change the trajectory
+IGNORED = ("Sound", "RenderRate", "SimulationSpeed", "TelemetryCapacity", "TelemetryDecimation",
+           "TelemetrySpillDir", "LivePlotFPS", "GainCacheFile", "RecordFile", "ExportFile", "PublishRate",
+           "SharedRingCapacity", "Profile", "ProfileWindow", "ProfileTrace", "plot_rootlocus")
+
+
+def params_digest(params):
+    """SHA-1 of the numeric and string parameters, to detect replays with other parameters."""
+    h = hashlib.sha1()
+    for name in sorted(vars(params)):
+        value = getattr(params, name)
+        if name.startswith("_") or name in IGNORED or not isinstance(value, (int, float, str, bool, np.ndarray)):
+            continue
+        h.update(name.encode())
+        h.update(np.asarray(value).tobytes() if not isinstance(value, str) else value.encode())
+    return h.digest()
+
+
+class EventLog:
+    """Writes the events of an interactive session as they happen."""
+
+    def __init__(self, path, params, physics_hz, integrator):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, physics_hz, integrator.encode(), params_digest(params)))
+
+    def inject(self, step, steps, Tp):
+        """Tp acting from physics step `step` for `steps` steps."""
+        self.file.write(RECORD.pack(INJECT, step, steps, Tp))
+
+    def reset(self, step):
+        self.file.write(RECORD.pack(RESET, step, 0, 0.0))
+
+    def close(self, step):
+        """End of the session after `step` physics steps."""
+        if not self.file.closed:
+            self.file.write(RECORD.pack(END, step, 0, 0.0))
+            self.file.close()
+
+
+def read_log(path):
+    """Header (physics_hz, integrator, digest) and a structured array of records."""
+    with open(path, "rb") as f:
+        magic, physics_hz, integrator, digest = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an RWIP session log")
+        body = f.read()
+    body = body[:len(body) - len(body) % RECORD.size]  # drop a partly written record
+    records = np.frombuffer(body, dtype=np.dtype([("kind", "<u1"), ("step", "<u8"), ("steps", "<u4"),
+                                                    ("value", "<f8")]))
+    return (physics_hz, integrator.rstrip(b"\0").decode(), digest), records
+
+
+def replay(path, params, every=1):
+    """Rerun a recorded session; returns the columns of rwip.simulate() every `every` steps.
+
+    t is the physics time since the start of the session (not reset by
+    RESET); "reset" marks the rows right after a reset. A session that was
+    not closed runs until its last recorded event.
+    """
+    (physics_hz, integrator, digest), records = read_log(path)
+    if digest != params_digest(params):
+        warnings.warn("session was recorded with different parameters, the replay will differ")
+    end = records["step"][records["kind"] == END]
+    n = int(end[0]) if len(end) else int(max((r["step"] + r["steps"] for r in records), default=0))
+
+    dt = 1.0 / physics_hz
+    physics_step = make_stepper(params, integrator)
+    controller = HybridController(params)
+    state = RwipState.from_params(params)
+    mode_index = {name: i for i, name in enumerate(MODES)}
+
+    # Torque per step, in log order like Session: an injection replaces the rest of
+    # the previous one and a reset cancels the rest of the running one
+    resets = set(records["step"][records["kind"] == RESET].tolist())
+    Tp_steps = np.zeros(n)
+    active_end = 0
+    for r in records:
+        step = int(r["step"])
+        if r["kind"] in (INJECT, RESET) and active_end > step:
+            Tp_steps[step:active_end] = 0.0
+            active_end = step
+        if r["kind"] == INJECT:
+            active_end = step + int(r["steps"])
+            Tp_steps[step:active_end] = r["value"]
+
+    rows = np.empty((n // every, len(COLUMNS)))
+    modes = np.empty(n // every, dtype=np.int8)
+    reset_rows = np.zeros(n // every, dtype=bool)
+    pending_reset = False
+    for k in range(n):
+        if k in resets:
+            state = RwipState.from_params(params)
+            state.Tm = 0
+            controller.reset()
+            pending_reset = True
+        Tp = Tp_steps[k]
+
+        # Same substep as session.Session.run
+        Vin = controller(state.qp, state.qp_d, state.qr, state.qr_d)
+        if params.MotorLimit:
+            if Vin > 24:
+                Vin = 24
+            elif Vin < -24:
+                Vin = -24
+        state = physics_step(state, Vin, Tp, dt)
+
+        if (k + 1) % every == 0:
+            i = (k + 1) // every - 1
+            rows[i] = ((k + 1) * dt, state.qp, state.qp_d, state.qr, state.qr_d, state.Tm, Vin, Tp, controller.setpoint)
+            modes[i] = mode_index[controller.mode]
+            reset_rows[i], pending_reset = pending_reset, False
+
+    out = {name: rows[:, i].copy() for i, name in enumerate(COLUMNS)}
+    out["mode"] = modes
+    out["reset"] = reset_rows
+    return out
+
+
+if __name__ == "__main__":
+    import param
+
+    start = time.perf_counter()
+    out = replay(sys.argv[1], param)
+    elapsed = time.perf_counter() - start
+    print(f"{len(out['t'])} steps ({out['t'][-1] if len(out['t']) else 0:.3f} s simulated) "
+          f"in {elapsed:.3f} s, {len(out['t']) / max(elapsed, 1e-9):.0f} steps/s")
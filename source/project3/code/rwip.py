@@ -0,0 +1,290 @@
+"""
+Reaction Wheel Inverted Pendulum - headless model
+
+Fixed-step batch engine for the RWIP model used by simulator.py. It runs the
+same motor, pendulum and hybrid controller equations without pygame, Qt or
+audio, so a trial runs as fast as the CPU allows and does not depend on the
+frame rate.
+
+Usage:
+    import param
+    from rwip import simulate
+
+    out = simulate(param, None, t_end=10.0, dt=1e-3)
+    out["t"], out["qp"], out["Vin"], ...
+
+"""
+
+import math
+import types
+
+import numpy as np
+
+# Controller modes, in the order used for the integer "mode" column
+MODES = ("Bang-bang", "brake", "LQR", "PID")
+
+# Float columns returned by simulate(), besides the integer "mode" column
+COLUMNS = ("t", "qp", "qp_d", "qr", "qr_d", "Tm", "Vin", "Tp", "setpoint")
+
+
+# ==========================================================================================
+# ===================================== PARAMETERS =========================================
+# ==========================================================================================
+def make_params(base, **overrides):
+    """Copy the parameters of a param-like module into a namespace, with overrides."""
+    names = {k: v for k, v in vars(base).items() if not k.startswith("_") and not isinstance(v, types.ModuleType)}
+    names.update(overrides)
+    if "kt" not in overrides and ("ke" in overrides or "Ng" in overrides):
+        names["kt"] = names["ke"] * names["Ng"]
+    return types.SimpleNamespace(**names)
+
+
+def system_matrices(params):
+    """Linearised state-space model (A, B) around the upright position."""
+    p = params
+    a = (p.m1 * p.L1 * p.L1) + (p.m2 * p.L2 * p.L2) + (p.I1)
+    b = (p.m1 * p.L1 + p.m2 * p.L2) * p.g
+
+    a21 = b / a
+    a24 = (p.kt * p.ke * p.Ng * p.Ng) / (a * p.R)
+    a41 = -b / a
+    a44 = -(a + p.J) * (p.kt * p.ke * p.Ng * p.Ng) / (a * p.J * p.R)
+
+    b2 = -(p.kt * p.Ng) / (a * p.R)
+    b4 = (a + p.J) * (p.kt * p.Ng) / (a * p.J * p.R)
+
+    A_matrix = np.array([[0, 1, 0, 0],
+                         [a21, 0, 0, a24],
+                         [0, 0, 0, 1],
+                         [a41, 0, 0, a44]])
+
+    B_Matrix = np.array([[0],
+                         [b2],
+                         [0],
+                         [b4]])
+    return A_matrix, B_Matrix
+
+
+# ==========================================================================================
+# ========================================= STATE ==========================================
+# ==========================================================================================
+class RwipState:
+    """Dynamic state of one RWIP: pendulum, wheel and motor current."""
+
+    __slots__ = ("qp", "qp_d", "qr", "qr_d", "curr_prev", "curr_d", "Tm")
+
+    def __init__(self, qp=0.0, qp_d=0.0, qr=0.0, qr_d=0.0, curr_prev=0.0, curr_d=0.0, Tm=0.0):
+        self.qp = qp
+        self.qp_d = qp_d
+        self.qr = qr
+        self.qr_d = qr_d
+        self.curr_prev = curr_prev
+        self.curr_d = curr_d
+        self.Tm = Tm
+
+    @classmethod
+    def from_params(cls, params):
+        """Initial state from the init_* values of params."""
+        return cls(np.deg2rad(params.init_qp), params.init_qp_d, params.init_qr, params.init_qr_d, Tm=params.init_Tm)
+
+    def copy(self):
+        return RwipState(self.qp, self.qp_d, self.qr, self.qr_d, self.curr_prev, self.curr_d, self.Tm)
+
+    def as_array(self):
+        """State as a flat float64 array in __slots__ order."""
+        return np.array([getattr(self, name) for name in self.__slots__], dtype=np.float64)
+
+    @classmethod
+    def from_array(cls, x):
+        return cls(*(float(v) for v in x))
+
+    def __repr__(self):
+        return "RwipState(" + ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__) + ")"
+
+
+# ==========================================================================================
+# ======================================= PHYSICS ==========================================
+# ==========================================================================================
+def pendulum_energy(params, qp, qp_d):
+    """Kinetic plus potential energy of the pendulum (same as PendulumEnergy)."""
+    p = params
+    K = (
+        (0.5 * p.m1 * (qp_d * p.L1) ** 2)
+        + (0.5 * p.m2 * (qp_d * p.L2) ** 2)
+        + (0.5 * p.J * qp_d * qp_d)
+        + (0.5 * p.I1 * qp_d * qp_d)
+    )  # Kinetic energy
+    P = (p.m1 + p.m2) * p.g * p.L2 * math.cos(qp)  # Potential energy
+    return K + P
+
+
+def motor_dynamics(params, Vin, qr, qr_d, curr_prev, curr_d, dt):
+    """One Euler step of the DC motor, returns (Tm, qr, qr_d, curr, curr_d)."""
+    p = params
+    curr = (Vin - (qr_d * p.ke) - (p.L * curr_d)) / p.R
+    curr_d = (curr - curr_prev) / dt
+    Tm = curr * p.kt
+    qr_dd = (Tm - p.B * qr_d) / p.J
+    qr_d = qr_d + (qr_dd * dt)
+    qr = qr + (qr_d * dt)
+    return Tm, qr, qr_d, curr, curr_d
+
+
+def rwip_dynamics(params, qp, qp_d, Tr, Tp):
+    """Pendulum angular acceleration (same as RwipDynamics)."""
+    p = params
+    return (
+        (p.m1 * p.g * p.L1 * math.sin(qp)) + (p.m2 * p.g * p.L2 * math.sin(qp)) - Tr + Tp - p.dp * qp_d
+    ) / ((p.m1 * p.L1**2.0) + (p.m2 * p.L2) + p.I1)
+
+
+def step(params, state, Vin, Tp, dt):
+    """Advance the plant by one Euler step of dt and return the new RwipState."""
+    Tm, qr, qr_d, curr, curr_d = motor_dynamics(params, Vin, state.qr, state.qr_d, state.curr_prev, state.curr_d, dt)
+    qp_dd = rwip_dynamics(params, state.qp, state.qp_d, Tm, Tp)
+    qp_d = state.qp_d + (qp_dd * dt)
+    qp = state.qp + (qp_d * dt)
+    return RwipState(qp, qp_d, qr, qr_d, curr, curr_d, Tm)
+
+
+# ==========================================================================================
+# ===================================== CONTROLLER =========================================
+# ==========================================================================================
+class HybridController:
+    """Bang-bang swing-up, brake and LQR/PID stabilizer of simulator.py.
+
+    Calling the controller with the measured state returns the motor voltage;
+    the active mode and setpoint are kept in ``mode`` and ``setpoint``.
+    """
+
+    def __init__(self, params, stabilizer=None, K=None):
+        self.params = params
+        self.stabilizer = stabilizer or params.Stabilize_Controller
+        if K is None and self.stabilizer == "LQR":
+            from gains import get_cache  # gains imports this module
+
+            K = get_cache(getattr(params, "GainCacheFile", None)).gain(params)
+        self.K = K
+        self.bound = np.deg2rad(params.StabilizeBound)
+        self.reqE = (params.m1 + params.m2) * params.g * params.L2 * math.cos(0)
+        self.reset()
+
+    def reset(self):
+        self.settled_flag = False
+        self.wait_flag = False
+        self.mode = "Bang-bang"
+        self.setpoint = 0.0
+
+    def __call__(self, qp, qp_d, qr, qr_d):
+        setpoint_offset = (qp - math.pi) / (2 * math.pi)
+        if setpoint_offset < 0:
+            self.setpoint = (math.floor(setpoint_offset) + 1) * 2 * math.pi
+        elif setpoint_offset > 0:
+            self.setpoint = math.ceil(setpoint_offset) * 2 * math.pi
+
+        E = pendulum_energy(self.params, qp, qp_d)
+
+        if self.wait_flag:
+            self.mode = "brake"
+            if abs(E) < 0.05:
+                self.wait_flag = False
+        elif abs(qp) % (2 * math.pi) <= self.bound or abs(qp) % (2 * math.pi) >= 2 * math.pi - self.bound:
+            self.settled_flag = True
+            self.mode = self.stabilizer
+        else:
+            if self.settled_flag:
+                self.wait_flag = True
+                self.settled_flag = False
+            if not self.wait_flag:
+                self.mode = "Bang-bang"
+
+        if self.mode == "LQR":
+            e = self.setpoint - qp
+            return e * self.K[0, 0] + qp_d * -self.K[0, 1]
+        if self.mode == "PID":
+            e = self.setpoint - qp
+            return -e * self.params.Kp
+        if self.mode == "Bang-bang":
+            if (qp_d < 0) == (E < self.reqE):
+                return 12.0
+            return -12.0
+        if self.mode == "brake":
+            return -12.0 if qp_d < 0 else 12.0
+        return 0.0
+
+
+# ==========================================================================================
+# ====================================== SIMULATE ==========================================
+# ==========================================================================================
+def simulate(params, controller=None, t_end=10.0, dt=1e-3, disturbance=None, x0=None, method="euler", **options):
+    """Run one trial at a fixed step dt without any display.
+
+    controller is a callable ``controller(qp, qp_d, qr, qr_d) -> Vin``, or None
+    for a HybridController built from params. disturbance is an optional
+    callable ``disturbance(t) -> Tp``. x0 is an RwipState or (qp, qp_d, qr,
+    qr_d) in rad and rad/s, by default the init_* values of params.
+
+    Returns a dict of NumPy arrays: t, qp, qp_d, qr, qr_d, Tm, Vin, Tp,
+    setpoint and mode (index into MODES, -1 for controllers without modes).
+
+    method "euler" is the discrete model of simulator.py; the other
+    integrators of integrators.METHODS run the continuous model through
+    integrators.simulate_ode, with options passed on.
+    """
+    if method != "euler":
+        from integrators import simulate_ode
+        return simulate_ode(params, controller, t_end, dt, method, disturbance, x0, **options)
+
+    p = params
+    if controller is None:
+        controller = HybridController(p)
+    if x0 is None:
+        x0 = RwipState.from_params(p)
+    elif not isinstance(x0, RwipState):
+        x0 = RwipState(*x0)
+    qp, qp_d, qr, qr_d = float(x0.qp), float(x0.qp_d), float(x0.qr), float(x0.qr_d)
+    curr_prev, curr_d = float(x0.curr_prev), float(x0.curr_d)
+
+    n = int(round(t_end / dt))
+    rows = np.empty((n, len(COLUMNS)))
+    modes = np.full(n, -1, dtype=np.int8)
+    mode_index = {name: i for i, name in enumerate(MODES)}
+
+    # Local constants, same equations as motor_dynamics and rwip_dynamics
+    ke, kt, R, L, B, J = p.ke, p.kt, p.R, p.L, p.B, p.J
+    grav = (p.m1 * p.L1 + p.m2 * p.L2) * p.g
+    inertia = (p.m1 * p.L1**2.0) + (p.m2 * p.L2) + p.I1
+    dp = p.dp
+    limit = 24.0 if p.MotorLimit else math.inf
+    sin = math.sin
+
+    Tp = 0.0
+    for k in range(n):
+        t = k * dt
+        Vin = controller(qp, qp_d, qr, qr_d)
+        if Vin > limit:
+            Vin = limit
+        elif Vin < -limit:
+            Vin = -limit
+        if disturbance is not None:
+            Tp = disturbance(t)
+
+        # Motor
+        curr = (Vin - (qr_d * ke) - (L * curr_d)) / R
+        curr_d = (curr - curr_prev) / dt
+        Tm = curr * kt
+        qr_d = qr_d + ((Tm - B * qr_d) / J) * dt
+        qr = qr + (qr_d * dt)
+        curr_prev = curr
+
+        # Pendulum
+        qp_dd = (grav * sin(qp) - Tm + Tp - dp * qp_d) / inertia
+        qp_d = qp_d + (qp_dd * dt)
+        qp = qp + (qp_d * dt)
+
+        rows[k] = (t + dt, qp, qp_d, qr, qr_d, Tm, Vin, Tp, getattr(controller, "setpoint", 0.0))
+        modes[k] = mode_index.get(getattr(controller, "mode", None), -1)
+
+    out = {name: rows[:, i].copy() for i, name in enumerate(COLUMNS)}
+    out["mode"] = modes
+    return out
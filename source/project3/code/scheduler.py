@@ -0,0 +1,65 @@
+"""
+Reaction Wheel Inverted Pendulum - fixed-step scheduler
+
+Decouples the physics rate from the render rate. Every frame the scheduler
+adds the elapsed wall-clock time (times the speed factor) to an accumulator
+and tells the loop how many fixed physics substeps to run; the leftover
+fraction of a step is used to interpolate the drawn state between the last
+two physics states.
+
+Usage:
+    scheduler = FixedStepScheduler(physics_hz=10000, speed=1.0)
+    while running:
+        for _ in range(scheduler.advance()):
+            prev, state = state, step(state, scheduler.dt)
+        draw(interpolate(prev, state, scheduler.alpha))
+
+"""
+
+import time
+
+from rwip import RwipState
+
+
+class FixedStepScheduler:
+    """Accumulator turning frame times into a whole number of physics steps.
+
+    speed > 1 runs faster than real time (batch previews), speed < 1 slower.
+    max_frame_time caps the simulated time per frame so a slow frame cannot
+    snowball into ever more substeps; the excess time is dropped.
+    """
+
+    def __init__(self, physics_hz=10000, speed=1.0, max_frame_time=0.25):
+        self.dt = 1.0 / physics_hz
+        self.speed = speed
+        self.max_frame_time = max_frame_time
+        self.reset()
+
+    def reset(self):
+        self.accumulator = 0.0
+        self._last = None
+
+    def advance(self, now=None):
+        """Number of physics steps to run for the frame ending at now."""
+        now = time.perf_counter() if now is None else now
+        if self._last is None:
+            self._last = now
+            return 0
+        elapsed = min(now - self._last, self.max_frame_time) * self.speed
+        self._last = now
+        self.accumulator += elapsed
+        steps = int(self.accumulator / self.dt)
+        self.accumulator -= steps * self.dt
+        return steps
+
+    @property
+    def alpha(self):
+        """Fraction of a physics step left in the accumulator, in [0, 1)."""
+        return self.accumulator / self.dt
+
+
+def interpolate(prev, curr, alpha):
+    """RwipState linearly interpolated between two physics states."""
+    return RwipState(*(a + (b - a) * alpha for a, b in zip(
+        (getattr(prev, name) for name in RwipState.__slots__),
+        (getattr(curr, name) for name in RwipState.__slots__))))
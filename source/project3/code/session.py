@@ -0,0 +1,147 @@
+"""
+Reaction Wheel Inverted Pendulum - simulator session
+
+Physics side of simulator.py without any display: state, hybrid controller,
+fixed-step integrator, the FUEL/TIME readout, and the optional session log
+(replay.py) and trajectory export (export.py). The GUI feeds it injections
+and resets and reads the fields below.
+
+Usage:
+    session = Session(param)
+    session.inject(Tp, steps)       # disturbance for the next steps
+    session.run(steps)
+    session.state, session.Vin, session.controller_mode, ...
+    session.close()
+
+"""
+
+import time
+
+import numpy as np
+
+from export import TrajectoryWriter
+from integrators import make_stepper
+from replay import EventLog
+from rwip import MODES, HybridController, RwipState
+
+
+class Session:
+    """One simulator run: physics, controller and FUEL/TIME bookkeeping."""
+
+    def __init__(self, params, profiler=None):
+        self.params = params
+        # Per-stage timers (profiling.Profiler), controller and physics are summed per run()
+        self.profiler = profiler if profiler is not None and profiler.enabled else None
+        self.dt = 1.0 / params.PhysicsRate
+        self.physics_step = make_stepper(params, params.Integrator)
+
+        # Bang-bang swing-up, brake and LQR/PID stabilizer
+        self.controller = HybridController(params)
+        self.state = RwipState.from_params(params)
+        self.prev_state = self.state  # Last physics state before state, for interpolation
+        self.Tp = params.init_Tp  # Disturbance torque of the last step
+        self.Vin = 0
+        self.setpoint = self.controller.setpoint
+        self.controller_mode = self.controller.mode
+
+        self.controller_stat_flag = False
+        self.controller_stat_flag_last = False
+        self.controller_time = 0
+        self.controller_energy = 0
+        self.timedt = 0
+        self.step_count = 0  # Physics steps since start, the time base of the session log
+        self.resets = 0
+        self._inject_Tp = 0.0
+        self._inject_steps = 0
+
+        # Log of injections and resets, replayable with replay.py
+        self.log = EventLog(params.RecordFile, params, params.PhysicsRate, params.Integrator) \
+            if params.RecordFile else None
+
+        # Full-rate trajectory for later analysis
+        self.trajectory = TrajectoryWriter(params.ExportFile) if params.ExportFile else None
+
+    def reset(self):
+        self.state = RwipState.from_params(self.params)
+        self.state.Tm = 0
+        self.prev_state = self.state
+        self.Tp = 0
+        self.controller.reset()
+        if self.log:
+            self.log.reset(self.step_count)
+        self.timedt = 0
+        self.controller_time = 0
+        self.controller_energy = 0
+        self._inject_steps = 0
+        self.resets += 1
+
+    def inject(self, Tp, steps):
+        """Apply the disturbance torque Tp during the next `steps` physics steps."""
+        if Tp != 0 and steps:
+            self._inject_Tp, self._inject_steps = Tp, steps
+            if self.log:
+                self.log.inject(self.step_count, steps, Tp)
+
+    def run(self, steps):
+        """Advance by `steps` physics steps."""
+        p = self.params
+        controller = self.controller
+        dt = self.dt
+        prof = self.profiler
+        if prof:
+            start = time.perf_counter()
+            controller_time = physics_time = 0.0
+        for _ in range(steps):
+            if self._inject_steps:
+                Tp = self._inject_Tp
+                self._inject_steps -= 1
+            else:
+                Tp = 0
+            if prof:
+                t0 = time.perf_counter()
+            Vin = controller(self.state.qp, self.state.qp_d, self.state.qr, self.state.qr_d)
+            self.setpoint = setpoint = controller.setpoint
+            self.controller_mode = controller_mode = controller.mode
+            if controller.settled_flag:
+                self.controller_stat_flag = True
+            if p.MotorLimit:
+                # Actual Limit
+                if Vin > 24:
+                    Vin = 24
+                elif Vin < -24:
+                    Vin = -24
+
+            if prof:
+                t1 = time.perf_counter()
+            self.prev_state, self.state = self.state, self.physics_step(self.state, Vin, Tp, dt)
+            if prof:
+                t2 = time.perf_counter()
+                controller_time += t1 - t0
+                physics_time += t2 - t1
+            state = self.state
+            self.step_count += 1
+            self.Vin, self.Tp = Vin, Tp
+            if self.trajectory:
+                self.trajectory.append(self.timedt + dt, state.qp, state.qp_d, state.qr, state.qr_d, state.Tm, Vin,
+                                       Tp, setpoint, MODES.index(controller_mode))
+
+            self.timedt += dt
+            if(abs(np.rad2deg(state.qp) - np.rad2deg(setpoint)) < 0.1):
+                self.controller_stat_flag = False
+            elif(self.controller_stat_flag):
+                self.controller_time += dt
+                self.controller_energy += abs(state.qr_d * state.Tm) * dt
+            if(controller_mode != p.Stabilize_Controller or not self.controller_stat_flag_last and self.controller_stat_flag and (abs(np.rad2deg(state.qp) - np.rad2deg(setpoint)) < 0.1)):
+                self.controller_time = 0
+                self.controller_energy = 0
+            self.controller_stat_flag_last = self.controller_stat_flag
+        if prof and steps:
+            prof.add("controller", controller_time)
+            prof.add("physics", physics_time)
+            prof.add("steps", time.perf_counter() - start, start)
+
+    def close(self):
+        if self.log:
+            self.log.close(self.step_count)
+        if self.trajectory:
+            self.trajectory.close()
@@ -122,16 +122,15 @@ init_Tp = 0.0  # Initial disturbance torque
 # ### DC motor simulation
 
 # %%
-def MotorDynamics(Vin, dt):
-    global qr_d, qr, curr_prev, curr_d
-    curr = (Vin - (qr_d * ke) - (L * curr_d)) / R
-    curr_d = (curr - curr_prev)/dt
+def MotorDynamics(state, Vin, dt):
+    """One motor step; takes the RwipState and returns the updated one."""
+    curr = (Vin - (state.qr_d * ke) - (L * state.curr_d)) / R
+    curr_d = (curr - state.curr_prev)/dt
     Tm = curr * kt
-    qr_dd = (Tm - B * qr_d) / J
-    qr_d = qr_d + (qr_dd * dt)
-    qr = qr + (qr_d * dt)
-    curr_prev = curr
-    return Tm
+    qr_dd = (Tm - B * state.qr_d) / J
+    qr_d = state.qr_d + (qr_dd * dt)
+    qr = state.qr + (qr_d * dt)
+    return RwipState(state.qp, state.qp_d, qr, qr_d, curr, curr_d, Tm)
 
 
 # %% [markdown]
@@ -146,7 +145,7 @@ def Forwardkinematics(q):
     y = L2 * math.cos(q)
     return x, y
 
-def PendulumEnergy(q):
+def PendulumEnergy(q, qp_d):
     K = (
         (0.5 * m1 * math.pow(qp_d * L1, 2))
         + (0.5 * m2 * math.pow(qp_d * L2, 2))
@@ -198,7 +197,7 @@ desired_poles = []
 # ### System simulation
 
 # %%
-def RwipDynamics(q, Tr, Tp):
+def RwipDynamics(q, qp_d, Tr, Tp):
     qdd = (
         (m1 * g * L1 * math.sin(q)) + (m2 * g * L2 * math.sin(q)) - Tr + Tp - dp * qp_d
     ) / ((m1 * L1**2.0) + (m2 * L2) + I1)
@@ -222,6 +221,7 @@ import pygetwindow as gw
 import pyaudio
 import threading
 import control
+from rwip import RwipState  # pendulum, wheel and motor state
 #import source.content.project3.code.thai.param as param  #only required when using param.py file
 
 
@@ -229,10 +229,11 @@ import control
 # ### Visualization
 
 # %%
-def plot_figure(screen, qp, qp_d, qr_d, Tm, Vin, Tp, setpoint):
+def plot_figure(screen, state, Vin, Tp, setpoint):
     x_offset = 200
     y_offset = 360
     multiplier = 800
+    qp, qp_d, qr, qr_d, Tm = state.qp, state.qp_d, state.qr, state.qr_d, state.Tm
 
     # Draw RWIP
     x, y = Forwardkinematics(qp)
@@ -354,16 +355,9 @@ if Sound:
 # ==========================================================================================
 # ======================================= MAIN LOGIC =======================================
 # ==========================================================================================
-qp = np.deg2rad(init_qp)
-qp_d = init_qp_d
-
-qr = init_qr  # Initial reaction wheel angle
-qr_d = init_qr_d  # Initial reaction wheel speed
-
-curr_prev = 0
-curr_d = 0
-
-Tm = init_Tm  # Initial reaction wheel torque
+state = RwipState(np.deg2rad(init_qp), init_qp_d,
+                  init_qr, init_qr_d,  # Initial reaction wheel angle and speed
+                  Tm=init_Tm)  # Initial reaction wheel torque
 Tp = init_Tp  # Initial disturbance torque
 
 controller_stat_flag = False
@@ -451,11 +445,7 @@ while running:
             if 10 < event.pos[0] < 110 and 10 < event.pos[1] < 60:
                 input_flag = True
             if 292 < event.pos[0] < 392 and 10 < event.pos[1] < 60:
-                qp = np.deg2rad(init_qp)
-                qp_d = init_qp_d 
-                qr = init_qr
-                qr_d = init_qr_d
-                Tm = 0
+                state = RwipState(np.deg2rad(init_qp), init_qp_d, init_qr, init_qr_d)
                 Tp = 0
                 settled_flag = False
                 wait_flag = False
@@ -490,6 +480,7 @@ while running:
     # ==========================================================================================
     # ======================================= Controller =======================================
     # ==========================================================================================
+    qp, qp_d = state.qp, state.qp_d
     setpoint_offset = (qp - math.pi) / (2 * math.pi) #why ?
     if setpoint_offset < 0:
         setpoint = (math.floor(setpoint_offset) + 1) * 2 * math.pi
@@ -497,7 +488,7 @@ while running:
         setpoint = math.ceil(setpoint_offset) * 2 * math.pi
     #well: would be more convenient to fold the phase
 
-    E = PendulumEnergy(q=qp)
+    E = PendulumEnergy(q=qp, qp_d=qp_d)
 
     if wait_flag:
         controller_mode = "brake"
@@ -541,11 +532,11 @@ while running:
         elif Vin < -24:
             Vin = -24
             
-    Tm = MotorDynamics(Vin, dt)
-    FREQUENCY = pow(abs(qr_d), 2)
-    qp_dd = RwipDynamics(qp, Tm, Tp)
-    qp_d = qp_d + (qp_dd * dt)
-    qp = qp + (qp_d * dt)
+    state = MotorDynamics(state, Vin, dt)
+    FREQUENCY = pow(abs(state.qr_d), 2)
+    qp_dd = RwipDynamics(qp, qp_d, state.Tm, Tp)
+    state.qp_d = qp_d + (qp_dd * dt)
+    state.qp = qp + (state.qp_d * dt)
 
     # Draw background
     screen.fill(WHITE)
@@ -558,12 +549,12 @@ while running:
         pygame.draw.line(screen, GREY, (0, i), (400, i), 1)
 
     # Draw figure
-    plot_figure(screen, qp, qp_d, qr_d, Tm, Vin, Tp, setpoint)
+    plot_figure(screen, state, Vin, Tp, setpoint)
     timedt_data.append(timedt)
-    qp_data.append(qp)
+    qp_data.append(state.qp)
     setpoint_data.append(setpoint)
-    Tm_data.append(Tm)
-    qr_d_data.append(qr_d)
+    Tm_data.append(state.Tm)
+    qr_d_data.append(state.qr_d)
 
     # move graph with pygame
     win.move(pygame_windows[0].left + 420, pygame_windows[0].top + 50)
@@ -586,12 +577,12 @@ while running:
     # calculate FPS and draw
     fps = clock.get_fps()
     timedt += dt
-    if(abs(np.rad2deg(qp) - np.rad2deg(setpoint)) < 0.1):
+    if(abs(np.rad2deg(state.qp) - np.rad2deg(setpoint)) < 0.1):
         controller_stat_flag = False
     elif(controller_stat_flag):
         controller_time += dt
-        controller_energy += abs(qr_d * Tm) * dt
-    if(controller_mode != Stabilize_Controller or not controller_stat_flag_last and controller_stat_flag and (abs(np.rad2deg(qp) - np.rad2deg(setpoint)) < 0.1)):
+        controller_energy += abs(state.qr_d * state.Tm) * dt
+    if(controller_mode != Stabilize_Controller or not controller_stat_flag_last and controller_stat_flag and (abs(np.rad2deg(state.qp) - np.rad2deg(setpoint)) < 0.1)):
         controller_time = 0
         controller_energy = 0
     controller_stat_flag_last = controller_stat_flag
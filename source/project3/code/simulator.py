@@ -1,47 +1,59 @@
+"""
+Reaction Wheel Inverted Pendulum - simulator
+
+Physics runs in this process (session.Session), the pygame window, live plot
+and sound in a child process (run_gui). GUI, audio, plotting and
+python-control are only imported by the code that uses them, and the LQR
+gain comes from the gain cache, so headless runs start quickly.
+
+Usage:
+    python simulator.py                       # interactive
+    python simulator.py --headless 10         # 10 s without any window, as fast as possible
+    python simulator.py --headless 10 --record session.rwlog --export run.parquet
+    python simulator.py --profile trace.json  # stage timers, overlay (F3) and a Chrome trace on exit
+
+"""
+
 import numpy as np
-import pygame
-from pygame.locals import QUIT, MOUSEBUTTONDOWN, KEYDOWN
 import sys
 import math
-import matplotlib.pyplot as plt
-from PyQt5.QtWidgets import QApplication, QMainWindow
-from PyQt5.QtCore import Qt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import pygetwindow as gw
-import pyaudio
-import threading
-import control
-import source.content.project3.code.thai.param as param
+import multiprocessing
+import queue
+import time
+import param
+from rwip import MODES, RwipState, make_params
+from scheduler import FixedStepScheduler, interpolate
+from telemetry import SharedRing
+from session import Session
+from profiling import REPORT_HEADER, Profiler, write_trace
 
 # Extracting constants from param module
-L1, L2, m1, m2, I1, I2, g, dp, wheelradius = param.L1, param.L2, param.m1, param.m2, param.I1, param.I2, param.g, param.dp, param.wheelradius
-J, Ng, ke, kt, R, L, B = param.J, param.Ng, param.ke, param.kt, param.R, param.L, param.B
-Q_LQR, R_LQR, N_LQR = param.Q_LQR, param.R_LQR, param.N_LQR
-StabilizeBound = param.StabilizeBound
-
-# LQR parameter
-a = (m1 * L1 * L1) + (m2 * L2 * L2) + (I1)
-b = (m1 * L1 + m2 * L2) * g
-
-a21 = b/a
-a24 = (kt * ke * Ng * Ng)/(a * R)
-a41 = -b/a
-a44 = -(a + J) * (kt * ke * Ng * Ng) /(a * J * R)
-
-b2 = -(kt*Ng)/(a*R)
-b4 = (a + J) * (kt * Ng)/(a * J * R)
-
-A_matrix = np.array([[0, 1, 0, 0],
-                     [a21, 0, 0, a24],
-                     [0, 0, 0, 1],
-                     [a41, 0, 0 , a44]])
-
-B_Matrix = np.array([[0],
-                     [b2],
-                     [0],
-                     [b4]])
-
-desired_poles = []
+L1, L2, m1, m2, I1, g, dp, wheelradius = param.L1, param.L2, param.m1, param.m2, param.I1, param.g, param.dp, param.wheelradius
+J, B = param.J, param.B
+
+# Columns of the shared ring between the physics and the GUI process
+# The previous physics state and the scheduler's alpha let the GUI interpolate the drawn state
+RING = ("timedt", "qp", "qp_d", "qr", "qr_d", "Tm", "Vin", "Tp", "setpoint", "mode", "energy", "time", "resets",
+        "prev_qp", "prev_qp_d", "prev_qr", "prev_qr_d", "prev_Tm", "alpha")
+
+TRACE_EVENTS = 200000  # Spans kept per process for the Chrome trace
+STATS_PERIOD = 0.25  # Seconds between profiler summaries sent to / shown by the GUI
+
+
+def profile_settings(trace=None):
+    """Profiler settings from param and the command line, passed explicitly to the GUI process.
+
+    With the spawn start method (Windows, macOS) the GUI process imports a
+    fresh param module, so command-line settings must not live in param.
+    """
+    trace = trace or param.ProfileTrace
+    return {"enabled": bool(param.Profile or trace), "window": param.ProfileWindow, "trace": trace}
+
+
+def make_profiler(settings, name):
+    return Profiler(settings["window"], TRACE_EVENTS if settings["trace"] else 0, settings["enabled"], name)
+
+
 # ==========================================================================================
 # ======================================= FUNCTION =========================================
 # ==========================================================================================
@@ -51,187 +63,79 @@ def Forwardkinematics(q):
     return x, y
 
 
-def PendulumEnergy(q):
-    K = (
-        (0.5 * m1 * math.pow(qp_d * L1, 2))
-        + (0.5 * m2 * math.pow(qp_d * L2, 2))
-        + (0.5 * J * qp_d * qp_d)
-        + (0.5 * I1 * qp_d * qp_d)
-    )  # Kinetic energy
-    P = (m1 + m2) * g * L2 * math.cos(q)  # Potential energy
-    return K + P
+def plot_figure(screen, state, Vin, Tp, setpoint, controller_mode, controller_energy, controller_time, text_cache):
+    """Draw the pendulum and its readouts; returns the dirty rects."""
+    import pygame
+    from render import BLACK, GREY, WHITE
 
-
-def MotorDynamics(Vin, dt):
-    global qr_d, qr, curr_prev, curr_d
-    curr = (Vin - (qr_d * ke) - (L * curr_d)) / R
-    curr_d = (curr - curr_prev)/dt
-    Tm = curr * kt
-    qr_dd = (Tm - B * qr_d) / J
-    qr_d = qr_d + (qr_dd * dt)
-    qr = qr + (qr_d * dt)
-    curr_prev = curr
-    return Tm
-
-
-def RwipDynamics(q, Tr, Tp):
-    qdd = (
-        (m1 * g * L1 * math.sin(q)) + (m2 * g * L2 * math.sin(q)) - Tr + Tp - dp * qp_d
-    ) / ((m1 * L1**2.0) + (m2 * L2) + I1)
-    return qdd
-
-
-def plot_figure(screen, qp, qp_d, qr_d, Tm, Vin, Tp, setpoint):
     x_offset = 200
     y_offset = 360
     multiplier = 800
+    qp, qp_d, qr, qr_d, Tm = state.qp, state.qp_d, state.qr, state.qr_d, state.Tm
+    rects = []
 
     # Draw RWIP
     x, y = Forwardkinematics(qp)
     x, y = x_offset - x * multiplier, y_offset - y * multiplier
-    pygame.draw.line(screen, BLACK, (x_offset, y_offset), (x, y), 5)
+    rects.append(pygame.draw.line(screen, BLACK, (x_offset, y_offset), (x, y), 5))
 
     # Draw wheel
-    pygame.draw.circle(screen, GREY, (x, y), wheelradius * multiplier, 8)
+    rects.append(pygame.draw.circle(screen, GREY, (x, y), wheelradius * multiplier, 8))
 
     # Draw cross
     cross_length = wheelradius * multiplier
-    cross_dx = cross_length * np.sin(qr) * 0.8
-    cross_dy = -cross_length * np.cos(qr) * 0.8
-    pygame.draw.line(
+    cross_dx = cross_length * math.sin(qr) * 0.8
+    cross_dy = -cross_length * math.cos(qr) * 0.8
+    rects.append(pygame.draw.line(
         screen, BLACK, (x - cross_dx, y - cross_dy), (x + cross_dx, y + cross_dy), 2
-    )
-    pygame.draw.line(
+    ))
+    rects.append(pygame.draw.line(
         screen, BLACK, (x - cross_dy, y + cross_dx), (x + cross_dy, y - cross_dx), 2
-    )
+    ))
 
     # Draw pendulum point
-    pygame.draw.circle(screen, BLACK, (x, y), 5)
-    pygame.draw.circle(screen, BLACK, (x_offset, y_offset), 5)
+    rects.append(pygame.draw.circle(screen, BLACK, (x, y), 5))
+    rects.append(pygame.draw.circle(screen, BLACK, (x_offset, y_offset), 5))
 
-    # Draw text
-    font = pygame.font.Font(None, 18)
+    # Draw text, labels and digits come from the cache
     texts = [
-        f"Setpoint (deg): {round(np.rad2deg(setpoint), 2)}",
-        f"Pendulum Angle (deg): {round(np.rad2deg(qp), 2)}",
-        f"Pendulum Speed (deg/s) : {round(np.rad2deg(qp_d), 2)}",
-        f"Controller Mode : {controller_mode}",
+        ("Setpoint (deg): ", round(np.rad2deg(setpoint), 2)),
+        ("Pendulum Angle (deg): ", round(np.rad2deg(qp), 2)),
+        ("Pendulum Speed (deg/s) : ", round(np.rad2deg(qp_d), 2)),
+        ("Controller Mode : ", controller_mode),
     ]
-    for i, text in enumerate(texts):
-        rendered_text = font.render(text, True, WHITE)
-        screen.blit(rendered_text, (10, 80 + i * 20))
-    
+    for i, (label, value) in enumerate(texts):
+        rects.append(text_cache.blit(screen, label, str(value), WHITE, (10, 80 + i * 20)))
+
     texts = [
-        f"Motorspeed (RPM): {round(qr_d * 60 / (math.pi * 2), 2)}",
-        f"Apply Torque (Nm): {round(Tm, 2)}",
-        f"Vin (V): {round(Vin, 2)}",
+        ("Motorspeed (RPM): ", round(qr_d * 60 / (math.pi * 2), 2)),
+        ("Apply Torque (Nm): ", round(Tm, 2)),
+        ("Vin (V): ", round(Vin, 2)),
     ]
-    for i, text in enumerate(texts):
-        rendered_text = font.render(text, True, WHITE)
-        screen.blit(rendered_text, (230, 80 + i * 20))
+    for i, (label, value) in enumerate(texts):
+        rects.append(text_cache.blit(screen, label, str(value), WHITE, (230, 80 + i * 20)))
 
     texts = [
-        f"FUEL: {round(controller_energy, 2)}",
-        f"TIME: {round(controller_time, 2)}",
+        ("FUEL: ", round(controller_energy, 2)),
+        ("TIME: ", round(controller_time, 2)),
     ]
-    for i, text in enumerate(texts):
-        rendered_text = font.render(text, True, BLACK)
-        screen.blit(rendered_text, (10, 170 + i * 20))
-
-
-def plot_graph():
-    plt.clf()
-
-    # Create the first subplot
-    plt.subplot(2, 1, 1)
-    plt.plot(timedt_data, qp_data, label="qp", color="blue", linewidth=2)
-    plt.plot(timedt_data, setpoint_data, label="setpoint", color="red", linewidth=2)
-    plt.legend()
-
-    # Create the second subplot
-    plt.subplot(2, 1, 2)
-    plt.plot(timedt_data, qr_d_data, label="qr_d", color="purple", linewidth=2)
-    plt.legend(loc="upper left")
-    ax2 = plt.twinx()
-    ax2.plot(timedt_data, Tm_data, label="Tm", color="green", linewidth=2)
-    ax2.set_ylim(-1, 1)
-    ax2.legend(loc="upper right")
-
-    # Display the figure
-    canvas = FigureCanvas(fig)
-    win.setCentralWidget(canvas)
-    win.show()
-
-def on_click(event):
-    plot_graph()
+    for i, (label, value) in enumerate(texts):
+        rects.append(text_cache.blit(screen, label, str(value), BLACK, (10, 170 + i * 20)))
+    return rects
 
 
 # ==========================================================================================
 # ========================================= EXTRA ==========================================
 # ==========================================================================================
+def plot_rootlocus():
+    import control
+    import matplotlib.pyplot as plt
 
-p = pyaudio.PyAudio()
-BITRATE = 90000  # number of frames per second/frameset.
-FREQUENCY = 2000  # Hz, waves per second, 261.63=C4-note.
-BITRATE = max(BITRATE, FREQUENCY + 100)
-stream = p.open(format=p.get_format_from_width(1), channels=1, rate=BITRATE, output=True)
-stop_thread = False
-
-def generate_sound():
-    """Generate and play sound with current frequency in a loop."""
-    while not stop_thread:
-        # Generate wave data for 1 second
-        NUMBEROFFRAMES = int(BITRATE * 0.0002)  # 1 second of sound
-        WAVEDATA = ""
-        for x in range(NUMBEROFFRAMES):
-            try:
-                WAVEDATA += chr(int(math.sin(x / ((BITRATE / FREQUENCY) / math.pi)) * 127 + 128))
-            except ZeroDivisionError:
-                WAVEDATA += chr(128)
-        # Play sound
-        stream.write(WAVEDATA)
-
-# Start sound generation in a separate thread
-sound_thread = threading.Thread(target=generate_sound)
-if param.Sound:
-    sound_thread.start()
+    # For PID control
+    s = control.TransferFunction.s
+    G = (s/(-J-m1*L1*L1))/((s**3 + ((B/I1) + (B + dp)/(m2*L2*L2))*s**2 - ((m1*L1 + m2*L2)*g/((J + m2*L2*L2)*I1) - (B + dp)/((J+m2*L2*L2)*I1))*s - (m1*L1 + m2*L2)*B*g/((J+m2*L2*L2)*I1)))
+    C = 1/s
 
-# ==========================================================================================
-# ======================================= MAIN LOGIC =======================================
-# ==========================================================================================
-qp = np.deg2rad(param.init_qp)
-qp_d = param.init_qp_d
-
-qr = param.init_qr  # Initial reaction wheel angle
-qr_d = param.init_qr_d  # Initial reaction wheel speed
-
-curr_prev = 0
-curr_d = 0
-
-Tm = param.init_Tm  # Initial reaction wheel torque
-Tp = param.init_Tp  # Initial disturbance torque
-
-controller_stat_flag = False
-controller_stat_flag_last = False
-controller_time = 0
-controller_energy = 0
-
-timedt = 0
-dt = 1 / 100  # frequency (Hz)
-reqE = (m1 + m2) * g * L2 * math.cos(0)
-
-setpoint = 0 # do not adjust
-
-# For LQR control
-K, S, E = control.lqr(A_matrix, B_Matrix, Q_LQR, R_LQR, N_LQR)
-
-# For PID control
-s = control.TransferFunction.s
-G = (s/(-J-m1*L1*L1))/((s**3 + ((B/I1) + (B + dp)/(m2*L2*L2))*s**2 - ((m1*L1 + m2*L2)*g/((J + m2*L2*L2)*I1) - (B + dp)/((J+m2*L2*L2)*I1))*s - (m1*L1 + m2*L2)*B*g/((J+m2*L2*L2)*I1)))
-C = 1/s
-
-# Plot the root locus
-if param.Stabilize_Controller == "PID" and param.plot_rootlocus:
     print("PID Mode")
     print("Waiting for root locus ...")
     print(G)
@@ -246,204 +150,291 @@ if param.Stabilize_Controller == "PID" and param.plot_rootlocus:
     print("Initialize simulation")
 
 
-d_flag = 0
-
-settled_flag = False
-wait_flag = False
-
-running = True
-input_flag = False
-input_string = ""
-
-pygame.init()
-
-width, height = 400, 560
-screen = pygame.display.set_mode((width, height))
-pygame.display.set_caption("Reaction Wheel Inverted Pendulum")
-pygame_windows = gw.getWindowsWithTitle("Reaction Wheel Inverted Pendulum")
-
-WHITE = (255, 255, 255)
-GREY = (100, 100, 100)
-RED = (255, 0, 0)
-BLACK = (0, 0, 0)
-
-font = pygame.font.Font(None, 36)
-clock = pygame.time.Clock()
-
-
-app = QApplication(sys.argv)
-win = QMainWindow()
-win.setWindowFlag(Qt.FramelessWindowHint)  # Remove the title bar
-fig = plt.figure(num="plot output", figsize=(5, 5))
-plt.text(0, 0.4, "Click on the pendulum display to plot.\n\nDon't spam, it lags.", fontsize = 15)
-plt.axis('off')
-canvas = FigureCanvas(fig)
-win.setCentralWidget(canvas)
-win.show()
-plt.gcf().canvas.mpl_connect('button_press_event', on_click)
-timedt_data = []
-qp_data = []
-setpoint_data = []
-Tm_data = []
-qr_d_data = []
-
-while running:
-    for event in pygame.event.get():
-        if event.type == QUIT:
-            running = False
-        elif event.type == MOUSEBUTTONDOWN:
-            if 10 < event.pos[0] < 110 and 10 < event.pos[1] < 60:
-                input_flag = True
-            if 292 < event.pos[0] < 392 and 10 < event.pos[1] < 60:
-                qp = np.deg2rad(param.init_qp)
-                qp_d = param.init_qp_d 
-                qr = param.init_qr
-                qr_d = param.init_qr_d
-                Tm = 0
-                Tp = 0
-                settled_flag = False
-                wait_flag = False
-                timedt = 0 
-                timedt_data = []
-                qp_data = []
-                setpoint_data = []
-                Tm_data = []
-                qr_d_data = []
-                controller_time = 0
-                controller_energy = 0
-            if event.pos[1] > 160:
-                plot_graph()
-        elif event.type == KEYDOWN:
-            if event.key == pygame.K_BACKSPACE:
-                input_string = input_string[:-1]
-            elif event.key == pygame.K_RETURN:
-                input_flag = True
-            else:
-                input_string += event.unicode
-
-    if input_flag == True:
-        try:
-            Tp = -float(input_string)
-        except:
-            Tp = 0
-            input_string = ""
-        input_flag = False
-    else:
-        Tp = 0
-
-    # ==========================================================================================
-    # ======================================= Controller =======================================
-    # ==========================================================================================
-    setpoint_offset = (qp - math.pi) / (2 * math.pi)
-    if setpoint_offset < 0:
-        setpoint = (math.floor(setpoint_offset) + 1) * 2 * math.pi
-    elif setpoint_offset > 0:
-        setpoint = math.ceil(setpoint_offset) * 2 * math.pi
-
-    E = PendulumEnergy(q=qp)
-
-    if wait_flag:
-        controller_mode = "brake"
-        if abs(E) < 0.05:
-            wait_flag = False
-    elif abs(qp) % (2 * math.pi) <= np.deg2rad(StabilizeBound) or abs(qp) % (2 * math.pi) >= np.deg2rad(360 - StabilizeBound):
-        settled_flag = True
-        controller_mode = param.Stabilize_Controller
-        controller_stat_flag = True
-    else:
-        if settled_flag:
-            wait_flag = True
-            settled_flag = False
-        if not wait_flag:
-            controller_mode = "Bang-bang"
-
-    if controller_mode == "LQR":
-        e = setpoint - qp
-        Vin = e * K[0, 0] + qp_d * -K[0, 1]
-    elif controller_mode == "PID":
-        e = setpoint - qp
-        Vin = -e * param.Kp
-    elif controller_mode == "Bang-bang":
-        if (qp_d < 0 and E < reqE) or (qp_d >= 0 and E >= reqE):
-            Vin = 12
-        elif (qp_d >= 0 and E < reqE) or (qp_d < 0 and E >= reqE):
-            Vin = -12
-        else:
-            Vin = 0
-    elif controller_mode == "brake":
-        if qp_d < 0:
-            Vin = -12
-        elif qp_d >= 0:
-            Vin = 12
-    else:
-        Vin = 0
-    if param.MotorLimit:
-        # Actual Limit
-        if Vin > 24:
-            Vin = 24
-        elif Vin < -24:
-            Vin = -24
-            
-    Tm = MotorDynamics(Vin, dt)
-    FREQUENCY = pow(abs(qr_d), 2)
-    qp_dd = RwipDynamics(qp, Tm, Tp)
-    qp_d = qp_d + (qp_dd * dt)
-    qp = qp + (qp_d * dt)
-
-    # Draw background
-    screen.fill(WHITE)
-    pygame.draw.rect(screen, (24, 24, 24), (0, 0, 401, 160))
-
-    # Draw grid
-    for i in range(0, 401, 50):
-        pygame.draw.line(screen, GREY, (i, 160), (i, 600), 1)
-    for i in range(160, 560, 50):
-        pygame.draw.line(screen, GREY, (0, i), (400, i), 1)
-
-    # Draw figure
-    plot_figure(screen, qp, qp_d, qr_d, Tm, Vin, Tp, setpoint)
-    timedt_data.append(timedt)
-    qp_data.append(qp)
-    setpoint_data.append(setpoint)
-    Tm_data.append(Tm)
-    qr_d_data.append(qr_d)
-
-    # move graph with pygame
-    win.move(pygame_windows[0].left + 420, pygame_windows[0].top + 50)
-    win.showNormal()
-
-    # Draw button
-    pygame.draw.rect(screen, GREY, (10, 10, 100, 50))
-    text = font.render("INJECT", True, WHITE)
-    screen.blit(text, (20, 23))
-    pygame.draw.rect(screen, RED, (292, 10, 100, 50))
-    text = font.render("RESET", True, (255, 255, 255))
-    screen.blit(text, (303, 23))
-
-    # Draw disturbance input field
-    pygame.draw.rect(screen, GREY, (110, 10, 130, 50))
-    pygame.draw.rect(screen, WHITE, (125, 20, 100, 30))
-    text = font.render(input_string, True, (0, 0, 0))
-    screen.blit(text, (130, 25))
-
-    # calculate FPS and draw
-    fps = clock.get_fps()
-    timedt += dt
-    if(abs(np.rad2deg(qp) - np.rad2deg(setpoint)) < 0.1):
-        controller_stat_flag = False
-    elif(controller_stat_flag):
-        controller_time += dt
-        controller_energy += abs(qr_d * Tm) * dt
-    if(controller_mode != param.Stabilize_Controller or not controller_stat_flag_last and controller_stat_flag and (abs(np.rad2deg(qp) - np.rad2deg(setpoint)) < 0.1)):
-        controller_time = 0
-        controller_energy = 0
-    controller_stat_flag_last = controller_stat_flag
-    if fps:
-        dt = 1 / fps
-
-    pygame.display.flip()
-    clock.tick(165)
-
-pygame.quit()
-stop_thread = True
-sys.exit()
+# ==========================================================================================
+# ========================================== GUI ===========================================
+# ==========================================================================================
+def run_gui(ring_name, commands, stats, profile):
+    """Window, live plot and sound; runs in its own process and only reads the shared ring.
+
+    INJECT, RESET and closing the window are sent to the physics process as
+    ("inject", Tp), ("reset",) and ("quit",) on the commands queue. Each frame
+    draws the newest published state, so a slow frame drops states instead
+    of slowing the physics down. With profile["enabled"] the stages of the frame
+    are timed and shown with the physics stages (from the stats queue) in an
+    overlay toggled with F3; the spans go back as ("trace", events) on quit.
+    """
+    import pygame
+    from pygame.locals import QUIT, MOUSEBUTTONDOWN, KEYDOWN
+    import matplotlib.pyplot as plt
+    from PyQt5.QtWidgets import QApplication, QMainWindow
+    from PyQt5.QtCore import Qt
+    from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+    import pygetwindow as gw
+    from render import BLACK, DirtyRects, TextCache, build_background, draw_lines
+    from sound import NullSink, Sound
+    from telemetry import RingBuffer
+    from liveplot import LivePlot
+
+    ring = SharedRing(RING, param.SharedRingCapacity, name=ring_name)
+    col = {name: i for i, name in enumerate(RING)}
+
+    # Tone following the wheel speed, silent sink when sound is off
+    sound = Sound() if param.Sound else Sound(sink=NullSink())
+
+    running = True
+    input_flag = False
+    input_string = ""
+    resets = 0
+
+    pygame.init()
+
+    width, height = 400, 560
+    screen = pygame.display.set_mode((width, height))
+    pygame.display.set_caption("Reaction Wheel Inverted Pendulum")
+    pygame_windows = gw.getWindowsWithTitle("Reaction Wheel Inverted Pendulum")
+
+    font = pygame.font.Font(None, 36)
+    clock = pygame.time.Clock()
+
+    # Static parts are drawn once, text surfaces are cached
+    background = build_background(width, height, font)
+    dirty = DirtyRects(screen, background)
+    text_cache = TextCache(pygame.font.Font(None, 18))
+    input_cache = TextCache(font)
+    overlay_cache = TextCache(pygame.font.SysFont("monospace", 11))
+
+    app = QApplication(sys.argv)
+    win = QMainWindow()
+    win.setWindowFlag(Qt.FramelessWindowHint)  # Remove the title bar
+    fig = plt.figure(num="plot output", figsize=(5, 5))
+    canvas = FigureCanvas(fig)
+    win.setCentralWidget(canvas)
+    win.show()
+    win_pos = None
+    data = RingBuffer(("timedt", "qp", "setpoint", "Tm", "qr_d"), param.TelemetryCapacity,
+                      param.TelemetryDecimation, param.TelemetrySpillDir)
+    live = LivePlot(fig, param.LivePlotFPS)
+    fig.canvas.mpl_connect('button_press_event', lambda event: live.update(data, force=True))
+
+    prof = make_profiler(profile, "gui")
+    overlay = prof.enabled
+    overlay_lines = []
+    physics_summary = {}
+    stats_time = 0.0
+
+    while running:
+        frame_start = time.perf_counter()
+        with prof.stage("events"):
+            for event in pygame.event.get():
+                if event.type == QUIT:
+                    running = False
+                elif event.type == pygame.VIDEOEXPOSE:
+                    dirty.invalidate()
+                elif event.type == MOUSEBUTTONDOWN:
+                    if 10 < event.pos[0] < 110 and 10 < event.pos[1] < 60:
+                        input_flag = True
+                    if 292 < event.pos[0] < 392 and 10 < event.pos[1] < 60:
+                        commands.put(("reset",))
+                    if event.pos[1] > 160:
+                        live.update(data, force=True)
+                elif event.type == KEYDOWN:
+                    if event.key == pygame.K_BACKSPACE:
+                        input_string = input_string[:-1]
+                    elif event.key == pygame.K_RETURN:
+                        input_flag = True
+                    elif event.key == pygame.K_F3:
+                        overlay = prof.enabled and not overlay
+                    else:
+                        input_string += event.unicode
+
+        if input_flag == True:
+            try:
+                commands.put(("inject", -float(input_string)))
+            except:
+                input_string = ""
+            input_flag = False
+
+        # Everything published since the last frame goes to the plot, the newest row is drawn
+        with prof.stage("telemetry"):
+            rows, _ = ring.read_new()
+            if len(rows):
+                row = rows[-1]
+                if row[col["resets"]] != resets:
+                    resets = row[col["resets"]]
+                    data.clear()
+                    live.reset()
+                    rows = rows[rows[:, col["resets"]] == resets]
+                for r in rows:
+                    data.append(r[col["timedt"]], r[col["qp"]], r[col["setpoint"]], r[col["Tm"]], r[col["qr_d"]])
+        if not len(rows):
+            clock.tick(param.RenderRate)
+            continue
+        with prof.stage("plot"):
+            live.update(data)
+
+        with prof.stage("sound"):
+            state = RwipState(row[col["qp"]], row[col["qp_d"]], row[col["qr"]], row[col["qr_d"]], Tm=row[col["Tm"]])
+            prev = RwipState(row[col["prev_qp"]], row[col["prev_qp_d"]], row[col["prev_qr"]], row[col["prev_qr_d"]],
+                             Tm=row[col["prev_Tm"]])
+            state = interpolate(prev, state, row[col["alpha"]])
+            sound.frequency = pow(abs(state.qr_d), 2)
+            sound.pump()
+
+        # Profiler text, refreshed a few times per second
+        if prof.enabled and frame_start - stats_time > STATS_PERIOD:
+            stats_time = frame_start
+            while True:
+                try:
+                    physics_summary = stats.get_nowait()
+                except queue.Empty:
+                    break
+            overlay_lines = [REPORT_HEADER] + prof.report() + prof.report(physics_summary, "physics")
+
+        with prof.stage("draw"):
+            # Restore the background where the last frame drew
+            dirty.begin()
+
+            # Draw figure
+            dirty.add(*plot_figure(screen, state, row[col["Vin"]], row[col["Tp"]], row[col["setpoint"]],
+                                   MODES[int(row[col["mode"]])], row[col["energy"]], row[col["time"]], text_cache))
+
+            # Draw disturbance input
+            dirty.add(screen.blit(input_cache.render(input_string, BLACK), (130, 25)))
+
+            if overlay:
+                dirty.add(*draw_lines(screen, overlay_cache, overlay_lines, (5, height - 13 * len(overlay_lines) - 5)))
+
+        # move graph with pygame, only when the window moved
+        with prof.stage("window move"):
+            pos = (pygame_windows[0].left + 420, pygame_windows[0].top + 50)
+            if pos != win_pos:
+                win.move(*pos)
+                win.showNormal()
+                win_pos = pos
+
+        with prof.stage("flip"):
+            dirty.flip()
+        if prof.enabled:
+            prof.add("frame", time.perf_counter() - frame_start, frame_start)
+        clock.tick(param.RenderRate)
+
+    if profile["trace"]:
+        commands.put(("trace", prof.trace_events()))
+    commands.put(("quit",))
+    pygame.quit()
+    data.close()
+    sound.close()
+    ring.close()
+
+
+# ==========================================================================================
+# ======================================= MAIN LOGIC =======================================
+# ==========================================================================================
+def publish(ring, session, alpha=0.0):
+    """Put the current session state on the shared ring."""
+    state, prev = session.state, session.prev_state
+    ring.append(session.timedt, state.qp, state.qp_d, state.qr, state.qr_d, state.Tm, session.Vin, session.Tp,
+                session.setpoint, MODES.index(session.controller_mode), session.controller_energy,
+                session.controller_time, session.resets, prev.qp, prev.qp_d, prev.qr, prev.qr_d, prev.Tm, alpha)
+
+
+def run_headless(t_end, params, profile):
+    """Run the session for t_end simulated seconds as fast as possible and print a summary."""
+    start = time.perf_counter()
+    prof = make_profiler(profile, "physics")
+    session = Session(params, prof)
+    steps = int(round(t_end * param.PhysicsRate))
+    chunk = max(1, param.PhysicsRate // param.PublishRate)  # Same batches as the interactive loop
+    for _ in range(0, steps, chunk):
+        session.run(min(chunk, steps - session.step_count))
+    session.close()
+    elapsed = time.perf_counter() - start
+    state = session.state
+    print(f"t = {session.timedt:.3f} s  qp = {np.rad2deg(state.qp):.2f} deg  qr_d = {state.qr_d:.2f} rad/s  "
+          f"mode = {session.controller_mode}")
+    print(f"{steps} steps in {elapsed:.3f} s ({steps / max(elapsed, 1e-9):.0f} steps/s)")
+    if prof.enabled:
+        print("\n".join([REPORT_HEADER] + prof.report()))
+    if profile["trace"]:
+        write_trace(profile["trace"], prof.trace_events())
+
+
+def main():
+    args = sys.argv[1:]
+    options = {}
+    for flag, name in (("--record", "RecordFile"), ("--export", "ExportFile"), ("--profile", "ProfileTrace")):
+        if flag in args:
+            i = args.index(flag)
+            options[name] = args[i + 1]
+            del args[i:i + 2]
+    profile = profile_settings(options.pop("ProfileTrace", None))
+    params = make_params(param, **options)  # Session settings, the GUI process does not need them
+    if args and args[0] == "--headless":
+        run_headless(float(args[1]) if len(args) > 1 else 10.0, params, profile)
+        return
+
+    prof = make_profiler(profile, "physics")
+    session = Session(params, prof)
+
+    # Plot the root locus
+    if param.Stabilize_Controller == "PID" and param.plot_rootlocus:
+        plot_rootlocus()
+
+    # The GUI runs in its own process and reads the state from shared memory
+    ring = SharedRing(RING, param.SharedRingCapacity)
+    commands = multiprocessing.Queue()
+    stats = multiprocessing.Queue()
+    gui = multiprocessing.Process(target=run_gui, args=(ring.name, commands, stats, profile), daemon=True)
+    gui.start()
+
+    # Fixed physics step, paced by the wall clock and independent of the GUI frame rate
+    scheduler = FixedStepScheduler(param.PhysicsRate, param.SimulationSpeed)
+    inject_steps = max(1, round(param.PhysicsRate / param.RenderRate))  # An injection lasts one frame
+    period = 1.0 / param.PublishRate
+    gui_trace = []
+
+    def handle(command):
+        if command[0] == "inject":
+            session.inject(command[1], inject_steps)
+        elif command[0] == "reset":
+            session.reset()
+        elif command[0] == "trace":
+            gui_trace.extend(command[1])
+        return command[0] != "quit"
+
+    running = True
+    stats_time = 0.0
+    try:
+        while running and gui.is_alive():
+            start = time.perf_counter()
+            with prof.stage("commands"):
+                while True:
+                    try:
+                        command = commands.get_nowait()
+                    except queue.Empty:
+                        break
+                    running = handle(command) and running
+
+            session.run(scheduler.advance(start))
+            with prof.stage("publish"):
+                publish(ring, session, scheduler.alpha)
+            if prof.enabled and start - stats_time > STATS_PERIOD:
+                stats_time = start
+                stats.put(prof.summary())
+            time.sleep(max(0.0, period - (time.perf_counter() - start)))
+    finally:
+        session.close()
+        gui.join(timeout=2.0)
+        while True:  # the GUI trace can still be queued when the GUI has already exited
+            try:
+                handle(commands.get_nowait())
+            except queue.Empty:
+                break
+        if profile["trace"]:
+            write_trace(profile["trace"], prof.trace_events(), gui_trace)
+        ring.close()
+    sys.exit()
+
+
+if __name__ == "__main__":
+    main()
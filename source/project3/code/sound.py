@@ -0,0 +1,130 @@
+"""
+Reaction Wheel Inverted Pendulum - sound
+
+Tone whose pitch follows the reaction wheel speed. A NumPy wavetable
+oscillator renders phase-continuous buffers of 8-bit samples; the main loop
+tops up a small bounded queue with pump() and the audio device pulls from it
+in callback mode, so there is no busy sound thread competing for the GIL.
+When the queue runs dry the callback plays silence instead of blocking.
+
+NullSink stands in for the audio device in headless runs and tests.
+
+Usage:
+    sound = Sound()                 # or Sound(sink=NullSink())
+    sound.frequency = 440.0
+    sound.pump()                    # once per frame
+    sound.close()
+
+"""
+
+import queue
+
+import numpy as np
+
+
+class ToneGenerator:
+    """Phase-continuous sine oscillator reading from a wavetable."""
+
+    def __init__(self, rate=44100, table_size=4096, amplitude=127):
+        self.rate = rate
+        self.table = (np.sin(2 * np.pi * np.arange(table_size) / table_size) * amplitude + 128).astype(np.uint8)
+        self.phase = 0.0
+        self.frequency = 0.0  # a single float, read once per buffer
+
+    def render(self, frames):
+        """Next `frames` unsigned 8-bit samples as bytes."""
+        frequency = min(abs(self.frequency), self.rate / 2)  # one read of the shared value
+        size = len(self.table)
+        increment = frequency * size / self.rate
+        index = (self.phase + increment * np.arange(frames)) % size
+        self.phase = (self.phase + increment * frames) % size
+        return self.table[index.astype(np.intp)].tobytes()
+
+
+class PyAudioSink:
+    """Audio device output through a PyAudio callback-mode stream."""
+
+    def __init__(self, rate, frames_per_buffer):
+        self.rate = rate
+        self.frames_per_buffer = frames_per_buffer
+        self._audio = None
+        self._stream = None
+
+    def open(self, callback):
+        import pyaudio
+
+        def stream_callback(in_data, frame_count, time_info, status):
+            return callback(frame_count), pyaudio.paContinue
+
+        self._audio = pyaudio.PyAudio()
+        self._stream = self._audio.open(format=self._audio.get_format_from_width(1), channels=1, rate=self.rate,
+                                        output=True, frames_per_buffer=self.frames_per_buffer,
+                                        stream_callback=stream_callback)
+        self._stream.start_stream()
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._audio.terminate()
+            self._stream = None
+
+
+class NullSink:
+    """Sink without a device; pull() plays the part of the audio callback."""
+
+    def __init__(self, rate=44100, frames_per_buffer=512):
+        self.rate = rate
+        self.frames_per_buffer = frames_per_buffer
+        self.frames = 0
+        self._callback = None
+
+    def open(self, callback):
+        self._callback = callback
+
+    def pull(self, frames=None):
+        data = self._callback(frames or self.frames_per_buffer)
+        self.frames += len(data)
+        return data
+
+    def close(self):
+        self._callback = None
+
+
+class Sound:
+    """Oscillator, bounded buffer queue and sink."""
+
+    def __init__(self, rate=44100, frames_per_buffer=512, queue_size=4, sink=None):
+        self.tone = ToneGenerator(rate)
+        self.frames_per_buffer = frames_per_buffer
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.silence = bytes([128]) * frames_per_buffer
+        self.underruns = 0
+        self.sink = sink if sink is not None else PyAudioSink(rate, frames_per_buffer)
+        self.pump()
+        self.sink.open(self._callback)
+
+    @property
+    def frequency(self):
+        return self.tone.frequency
+
+    @frequency.setter
+    def frequency(self, value):
+        self.tone.frequency = float(value)
+
+    def pump(self):
+        """Top up the queue with new buffers; call once per frame."""
+        while not self.queue.full():
+            self.queue.put_nowait(self.tone.render(self.frames_per_buffer))
+
+    def _callback(self, frame_count):
+        if frame_count != self.frames_per_buffer:
+            return self.tone.render(frame_count)
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            self.underruns += 1
+            return self.silence
+
+    def close(self):
+        self.sink.close()
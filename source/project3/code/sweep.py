@@ -0,0 +1,135 @@
+"""
+Reaction Wheel Inverted Pendulum - parameter sweep
+
+Runs headless RWIP trials (rwip.simulate) for a grid or a random sample of
+controller settings across a process pool and collects one row per trial:
+the settings plus settle time, control energy and peak voltage.
+
+Sweep variables are any param names (R_LQR, StabilizeBound, Kp, ...) and
+Q_qp, Q_qp_d, Q_qr, Q_qr_d for the diagonal of Q_LQR. Random points are drawn
+up front from one seed and rows come back in trial order, so a sweep gives
+the same table on 1 or 64 workers. LQR gains of all points are solved in one
+batch through the gains.GainCache before the trials are sent out.
+
+Usage:
+    import param
+    from sweep import grid, random_sample, run_sweep, write_csv
+
+    points = grid(Q_qp=[100, 342, 1000], R_LQR=[10, 100], StabilizeBound=[15, 25])
+    rows = run_sweep(points, param, t_end=10.0, workers=8)
+    write_csv(rows, "sweep.csv")
+
+"""
+
+import csv
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from gains import get_cache
+from rwip import HybridController, make_params, simulate
+
+Q_NAMES = ("Q_qp", "Q_qp_d", "Q_qr", "Q_qr_d")
+METRICS = ("settled", "settle_time", "energy", "stabilize_energy", "peak_voltage")
+
+
+def grid(**axes):
+    """All combinations of the given values, as a list of dicts."""
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[name] for name in names))]
+
+
+def random_sample(n, seed=0, log=(), **ranges):
+    """n points drawn uniformly from (low, high) ranges; names in log are drawn log-uniformly."""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, (low, high) in ranges.items():
+        if name in log:
+            columns[name] = np.exp(rng.uniform(math.log(low), math.log(high), n))
+        else:
+            columns[name] = rng.uniform(low, high, n)
+    return [{name: float(columns[name][i]) for name in ranges} for i in range(n)]
+
+
+def trial_params(base, point):
+    """Parameters of one trial: base with the point's values applied."""
+    overrides = {k: v for k, v in point.items() if k not in Q_NAMES}
+    if any(k in point for k in Q_NAMES):
+        Q = np.array(base.Q_LQR, dtype=float)
+        for i, name in enumerate(Q_NAMES):
+            if name in point:
+                Q[i, i] = point[name]
+        overrides["Q_LQR"] = Q
+    return make_params(base, **overrides)
+
+
+def trial_metrics(out, tol_deg=0.1):
+    """Settle time, energy and peak voltage of one simulate() result.
+
+    settle_time is the time from which |qp - setpoint| stays below tol_deg
+    until the end (0 if it never leaves the band, nan if it never settles). energy integrates |qr_d * Tm|
+    like the FUEL readout; stabilize_energy only counts the LQR/PID phase.
+    """
+    t = out["t"]
+    dt = t[1] - t[0] if len(t) > 1 else 0.0
+    outside = np.abs(np.rad2deg(out["qp"] - out["setpoint"])) >= tol_deg
+    settled = not outside[-1] if len(t) else False
+    if settled:
+        last = np.flatnonzero(outside)
+        settle_time = t[last[-1] + 1] if len(last) else 0.0
+    else:
+        settle_time = math.nan
+    power = np.abs(out["qr_d"] * out["Tm"])
+    stabilizing = out["mode"] >= 2  # LQR or PID, see rwip.MODES
+    return {
+        "settled": bool(settled),
+        "settle_time": float(settle_time),
+        "energy": float(power.sum() * dt),
+        "stabilize_energy": float(power[stabilizing].sum() * dt),
+        "peak_voltage": float(np.abs(out["Vin"]).max()) if len(t) else 0.0,
+    }
+
+
+def run_trial(base, point, t_end=10.0, dt=1e-3, method="euler", K=None):
+    """One headless trial; returns the point merged with its metrics."""
+    p = trial_params(base, point)
+    out = simulate(p, HybridController(p, K=K), t_end, dt, method=method)
+    return {**point, **trial_metrics(out)}
+
+
+def _run_trial(args):
+    return run_trial(*args)
+
+
+def run_sweep(points, base, t_end=10.0, dt=1e-3, method="euler", workers=None, chunksize=None):
+    """Run all points, in parallel for workers != 1; rows are in the order of points.
+
+    base can be the param module or a make_params() namespace.
+    """
+    base = make_params(base)  # modules cannot be sent to worker processes
+    gains = [None] * len(points)
+    trials = [trial_params(base, point) for point in points]
+    lqr = [i for i, p in enumerate(trials) if p.Stabilize_Controller == "LQR"]
+    if lqr:
+        cache = get_cache(getattr(base, "GainCacheFile", None))
+        for i, K in zip(lqr, cache.gains([trials[i] for i in lqr])):
+            gains[i] = K[None, :]
+    jobs = [(base, point, t_end, dt, method, K) for point, K in zip(points, gains)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        return [_run_trial(job) for job in jobs]
+    chunksize = chunksize or max(1, len(jobs) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run_trial, jobs, chunksize=chunksize))
+
+
+def write_csv(rows, path):
+    """Write sweep rows to a CSV file, one column per setting and metric."""
+    columns = list(dict.fromkeys(k for row in rows for k in row))
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
@@ -0,0 +1,186 @@
+"""
+Reaction Wheel Inverted Pendulum - telemetry store
+
+Preallocated, fixed-capacity, column-oriented ring buffer for the samples the
+simulator plots. Memory stays flat however long the session runs: when the
+buffer is full the oldest samples are overwritten, or, with a spill
+directory, written to disk in chunks first so the full history is kept.
+
+SharedRing is the same idea in shared memory, written by the physics process
+and read by the GUI process without locks: the writer never waits, a slow
+reader just misses the samples that were overwritten.
+
+Usage:
+    from telemetry import RingBuffer, read_spill
+
+    data = RingBuffer(("timedt", "qp"), capacity=20000, decimation=2, spill_dir="run1")
+    data.append(t, qp)
+    data["qp"]            # last samples in time order
+    read_spill("run1")    # full history from disk
+
+    ring = SharedRing(("timedt", "qp"), capacity=4096)        # writer
+    reader = SharedRing(("timedt", "qp"), 4096, name=ring.name)  # other process
+    ring.append(t, qp); rows, lost = reader.read_new()
+
+"""
+
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-capacity ring buffer with one float64 row per column."""
+
+    def __init__(self, columns, capacity=20000, decimation=1, spill_dir=None):
+        self.columns = tuple(columns)
+        self.capacity = int(capacity)
+        self.decimation = max(1, int(decimation))
+        self.spill_dir = spill_dir
+        self._index = {name: i for i, name in enumerate(self.columns)}
+        self._data = np.empty((len(self.columns), self.capacity))
+        self._chunk = max(1, self.capacity // 2)
+        self._chunks = 0
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._chunks = len(_chunk_files(spill_dir))  # append to an earlier session
+        self._calls = self._total = self._spilled = 0
+
+    def clear(self):
+        """Drop all samples in memory (chunks already on disk are kept)."""
+        self._flush()
+        self._calls = 0  # append() calls, before decimation
+        self._total = 0  # samples stored since clear()
+        self._spilled = 0  # samples of those already on disk
+
+    def append(self, *values):
+        """Store one sample, values in column order."""
+        self._calls += 1
+        if (self._calls - 1) % self.decimation:
+            return
+        self._data[:, self._total % self.capacity] = values
+        self._total += 1
+        if self.spill_dir is not None and self._total - self._spilled >= self._chunk:
+            self._flush()
+
+    @property
+    def total(self):
+        """Samples stored since the last clear(), including overwritten ones."""
+        return self._total
+
+    def __len__(self):
+        return min(self._total, self.capacity)
+
+    def __getitem__(self, name):
+        """Samples of one column in time order (a copy)."""
+        row = self._data[self._index[name]]
+        if self._total <= self.capacity:
+            return row[:self._total].copy()
+        start = self._total % self.capacity
+        return np.concatenate((row[start:], row[:start]))
+
+    def tail(self, name, n):
+        """Last n samples of one column in time order (at most len(self), a copy)."""
+        n = min(n, len(self))
+        return self._data[self._index[name], np.arange(self._total - n, self._total) % self.capacity]
+
+    def as_dict(self):
+        return {name: self[name] for name in self.columns}
+
+    def _flush(self):
+        """Write the samples not yet on disk as one .npz chunk."""
+        if self.spill_dir is None or self._total == self._spilled:
+            return
+        idx = np.arange(self._spilled, self._total) % self.capacity
+        path = os.path.join(self.spill_dir, f"chunk_{self._chunks:06d}.npz")
+        np.savez(path, **{name: self._data[i, idx] for i, name in enumerate(self.columns)})
+        self._chunks += 1
+        self._spilled = self._total
+
+    def close(self):
+        """Write any remaining samples to the spill directory."""
+        self._flush()
+
+
+def read_spill(spill_dir):
+    """Concatenate all chunks of a spill directory into one dict of arrays."""
+    chunks = [np.load(os.path.join(spill_dir, f)) for f in _chunk_files(spill_dir)]
+    if not chunks:
+        return {}
+    return {name: np.concatenate([c[name] for c in chunks]) for name in chunks[0].files}
+
+
+def _chunk_files(spill_dir):
+    return sorted(f for f in os.listdir(spill_dir) if f.startswith("chunk_") and f.endswith(".npz"))
+
+
+class SharedRing:
+    """Single-writer ring of float64 rows in shared memory.
+
+    The first 8 bytes hold the number of rows written so far; the writer
+    stores a row before bumping the count, and a reader drops the rows that
+    may have been overwritten while it copied them.
+    """
+
+    def __init__(self, columns, capacity=4096, name=None):
+        self.columns = tuple(columns)
+        self.capacity = int(capacity)
+        self._index = {name: i for i, name in enumerate(self.columns)}
+        size = 8 + 8 * self.capacity * len(self.columns)
+        self.owner = name is None
+        self._shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self._count = np.ndarray((1,), dtype=np.int64, buffer=self._shm.buf)
+        self._rows = np.ndarray((self.capacity, len(self.columns)), dtype=np.float64, buffer=self._shm.buf, offset=8)
+        if self.owner:
+            self._count[0] = 0
+        self._read = 0
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def total(self):
+        """Rows written since the ring was created."""
+        return int(self._count[0])
+
+    def index(self, name):
+        return self._index[name]
+
+    def append(self, *values):
+        """Write one row, values in column order (writer only)."""
+        n = int(self._count[0])
+        self._rows[n % self.capacity] = values
+        self._count[0] = n + 1
+
+    def latest(self):
+        """Copy of the newest row, or None before the first one."""
+        while True:
+            n = int(self._count[0])
+            if n == 0:
+                return None
+            row = self._rows[(n - 1) % self.capacity].copy()
+            if int(self._count[0]) - n < self.capacity - 1:
+                return row
+
+    def read_new(self):
+        """Rows written since the last read_new() (N, columns) and the number of rows missed."""
+        n = int(self._count[0])
+        start = max(self._read, n - self.capacity + 1)
+        lost = start - self._read
+        idx = np.arange(start, n) % self.capacity
+        rows = self._rows[idx]
+        # Rows the writer may have overwritten during the copy
+        overrun = int(self._count[0]) - self.capacity + 1 - start
+        if overrun > 0:
+            rows = rows[overrun:]
+            lost += overrun
+        self._read = n
+        return rows, lost
+
+    def close(self):
+        del self._count, self._rows
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
@@ -0,0 +1,31 @@
+"""The default gain cache must carry the synthesized LQR gain over to the next process."""
+
+import os
+import subprocess
+import sys
+
+CODE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Builds the controller the way headless and CLI runs do and prints the gain cache counters
+SCRIPT = """
+import param
+from gains import get_cache
+from rwip import HybridController
+
+controller = HybridController(param)
+cache = get_cache(param.GainCacheFile)
+print(cache.hits, cache.misses, param.GainCacheFile)
+"""
+
+
+def run_controller(cache_home):
+    env = dict(os.environ, XDG_CACHE_HOME=str(cache_home))
+    out = subprocess.run([sys.executable, "-c", SCRIPT], cwd=CODE, env=env, capture_output=True, text=True, check=True)
+    hits, misses, path = out.stdout.split()
+    return int(hits), int(misses), path
+
+
+def test_second_process_hits_cache(tmp_path):
+    assert run_controller(tmp_path) == (0, 1, str(tmp_path / "rwip" / "lqr_gains.npz"))
+    assert os.path.exists(tmp_path / "rwip" / "lqr_gains.npz")
+    assert run_controller(tmp_path)[:2] == (1, 0)
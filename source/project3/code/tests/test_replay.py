@@ -0,0 +1,46 @@
+"""Replays of recorded sessions must reproduce the live trajectory exactly."""
+
+import numpy as np
+import pytest
+
+import param
+from replay import replay
+from rwip import make_params
+from session import Session
+
+INJECT_STEPS = 167  # One 60 Hz frame at 10 kHz
+
+
+def live_run(params, script):
+    """Run a Session through script [(action, steps)] step by step; returns qp and qp_d per step."""
+    session = Session(params)
+    qp, qp_d = [], []
+    for action, arg in script:
+        if action == "inject":
+            session.inject(arg, INJECT_STEPS)
+        elif action == "reset":
+            session.reset()
+        else:
+            for _ in range(arg):
+                session.run(1)
+                qp.append(session.state.qp)
+                qp_d.append(session.state.qp_d)
+    session.close()
+    return np.array(qp), np.array(qp_d)
+
+
+@pytest.mark.parametrize("script", [
+    [("run", 3000), ("inject", -5.0), ("run", 50), ("reset", None), ("run", 2000)],   # reset cancels the injection
+    [("run", 3000), ("inject", -5.0), ("run", 500), ("reset", None), ("run", 2000)],  # reset after it ended
+    [("run", 3000), ("inject", -5.0), ("reset", None), ("run", 2000)],                # reset in the same step
+    [("run", 3000), ("reset", None), ("inject", 5.0), ("run", 2000)],                 # injection after the reset
+    [("run", 1000), ("inject", -5.0), ("run", 60), ("inject", 3.0), ("run", 2000)],   # injection replaced
+], ids=["reset-during", "reset-after", "reset-same-step", "inject-after-reset", "inject-twice"])
+def test_replay_matches_live(tmp_path, script):
+    path = str(tmp_path / "session.rwlog")
+    params = make_params(param, RecordFile=path, GainCacheFile=None)
+    qp, qp_d = live_run(params, script)
+    out = replay(path, make_params(param, GainCacheFile=None))
+    assert len(out["qp"]) == len(qp)
+    np.testing.assert_array_equal(out["qp"], qp)
+    np.testing.assert_array_equal(out["qp_d"], qp_d)
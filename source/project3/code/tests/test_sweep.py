@@ -0,0 +1,37 @@
+"""Settle times of sweep.trial_metrics, the same convention as basin.run_cells."""
+
+import math
+
+import numpy as np
+
+from sweep import trial_metrics
+
+
+def trial(qp, dt=1e-3):
+    """simulate()-like result with the given pendulum angles and everything else zero."""
+    qp = np.asarray(qp, dtype=float)
+    zeros = np.zeros(len(qp))
+    return {"t": dt * np.arange(1, len(qp) + 1), "qp": qp, "setpoint": zeros, "qr_d": zeros, "Tm": zeros,
+            "Vin": zeros, "mode": np.full(len(qp), 2)}
+
+
+def test_always_settled():
+    metrics = trial_metrics(trial(np.zeros(100)))
+    assert metrics["settled"]
+    assert metrics["settle_time"] == 0.0
+
+
+def test_settles_after_leaving_band():
+    qp = np.zeros(100)
+    qp[:10] = 0.1  # Outside the 0.1 degree band for the first 10 samples
+    metrics = trial_metrics(trial(qp))
+    assert metrics["settled"]
+    assert metrics["settle_time"] == 11e-3  # Time of the first sample that stays inside
+
+
+def test_not_settled():
+    qp = np.zeros(100)
+    qp[-1] = 0.1
+    metrics = trial_metrics(trial(qp))
+    assert not metrics["settled"]
+    assert math.isnan(metrics["settle_time"])